@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+### Benchmark suite of the GTSP solver, see ../common/benchmarking.py
+### Runs are also compared with the best-known cost from the G-TOURS file
+### names, e.g.
+###   python benchmark.py --tier small medium --config CABS
+###   python benchmark.py --tier small --save-baseline after-reduction
+
+import os
+import re
+
+import common_path  # noqa: F401
+import benchmarking
+import tsp_file_parser
+from run_batch import SOLVER_SCRIPT
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ARCHIVE = os.path.join(HERE, "MOM-instances.zip")
+INSTANCE_PATTERN = ARCHIVE + tsp_file_parser.ARCHIVE_SEPARATOR + "MOM-instances/INSTANCES/{}.gtsp"
+BEST_KNOWN_PATTERN = "MOM-instances/G-TOURS/*.tour"
+SHIPPED_LOGS = [os.path.join(HERE, "log.csv")]
+
+# Tiers by the solve time of the shipped log: below a second, up to a
+# minute, and instances that take minutes or hit the time limit
+TIERS = {
+    "small": ["5eil51", "5berlin52", "5st70", "5pr76", "10i30-17", "10i45-18", "8berlin52-2x4", "9eil51-3x3"],
+    "medium": ["10eil51", "10berlin52", "10st70", "10eil76", "10pr76", "10kroB100", "10i90-33", "12eil76-3x4"],
+    "large": ["15eil51", "15berlin52", "15eil76", "15pr76", "10i120-46", "16st70-4x4", "25rat99", "25kroA100"],
+}
+
+
+def best_known_costs():
+    """
+    :return: dict of instance name -> cost of the G-TOURS file name
+        (e.g. 10berlin52.3223.tour)
+    """
+    costs = {}
+    for member in tsp_file_parser.archive_members(ARCHIVE, BEST_KNOWN_PATTERN):
+        match = re.match(r"(.+)\.(\d+)\.tour$", member.split("/")[-1])
+        if match:
+            costs[match.group(1)] = int(match.group(2))
+    return costs
+
+
+if __name__ == "__main__":
+    benchmarking.main(TIERS, lambda name, args: INSTANCE_PATTERN.format(name), os.path.join(HERE, SOLVER_SCRIPT),
+        SHIPPED_LOGS, best_known=best_known_costs())
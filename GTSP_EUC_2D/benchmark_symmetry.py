@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+### Expanded nodes with and without tour-direction symmetry breaking
+### Runs every instance once plain and once with --symmetric through the batch
+### runner and compares the NodesExpanded of the two runs, e.g.
+###   python benchmark_symmetry.py run-MOM-small.bat --config CAASDy
+
+import argparse
+import csv
+import math
+import os
+import shlex
+from concurrent.futures import ThreadPoolExecutor
+
+import common_path  # noqa: F401
+import batch
+from run_batch import SOLVER_SCRIPT
+
+
+def compare(rows):
+    """
+    :param rows: (instance, plain row, symmetric row) of the batch runner
+    :return: ratios of expanded nodes, symmetric / plain, where both runs finished
+    """
+    ratios = []
+    for instance, plain, symmetric in rows:
+        expanded = [row.get("NodesExpanded") for row in (plain, symmetric)]
+        optimal = [row.get("Opt") == "True" for row in (plain, symmetric)]
+        ratio = None
+        if all(expanded) and int(expanded[0]) > 0 and all(optimal):
+            ratio = int(expanded[1]) / int(expanded[0])
+            ratios.append(ratio)
+        print("{:30} {:>14} {:>14} {:>8}".format(
+            os.path.basename(instance), expanded[0] or plain["Status"], expanded[1] or symmetric["Status"],
+            "{:.3f}".format(ratio) if ratio is not None else "-"))
+    return ratios
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("instances", nargs="+", type=str, help="globs or instance list files")
+    parser.add_argument("--solver-script", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), SOLVER_SCRIPT), type=str)
+    parser.add_argument("--config", default="CAASDy", type=str)
+    parser.add_argument("--time-out", default=300, type=int)
+    parser.add_argument("--wall-clock-limit", default=None, type=int, help="seconds, default time-out + 60")
+    parser.add_argument("--memory-limit", default=None, type=int, help="MB per job")
+    parser.add_argument("--jobs", default=None, type=int)
+    parser.add_argument("--output", default="symmetry.csv", type=str)
+    parser.add_argument("--log-dir", default=None, type=str)
+    parser.add_argument("--solver-args", default="", type=str, help="further options passed on to the solver")
+    args = parser.parse_args()
+    solver_args = shlex.split(args.solver_args)
+
+    instances = batch.expand_instances(args.instances)
+    if args.log_dir:
+        os.makedirs(args.log_dir, exist_ok=True)
+
+    def run(instance, extra_args):
+        job_args = argparse.Namespace(**dict(vars(args), solver_args=solver_args + extra_args))
+        return batch.run_job((instance, args.config, 1, 2023, 1), job_args)
+
+    workers = min(args.jobs or batch.available_cores(), 2 * len(instances)) or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [(instance, executor.submit(run, instance, []), executor.submit(run, instance, ["--symmetric"]))
+            for instance in instances]
+        rows = [(instance, plain.result(), symmetric.result()) for instance, plain, symmetric in futures]
+
+    print("{:30} {:>14} {:>14} {:>8}".format("Instance", "Expanded", "Symmetric", "Ratio"))
+    ratios = compare(rows)
+    if ratios:
+        geometric_mean = math.exp(sum(math.log(max(ratio, 1e-9)) for ratio in ratios) / len(ratios))
+        print("Geometric mean ratio over {} instances solved to optimality both ways: {:.3f}".format(len(ratios), geometric_mean))
+
+    with open(args.output, "w", newline="") as csvfile:
+        csv_writer = csv.writer(csvfile)
+        csv_writer.writerow(["Instance", "Config", "NodesExpanded", "NodesExpandedSymmetric", "Cost", "CostSymmetric"])
+        for instance, plain, symmetric in rows:
+            csv_writer.writerow([instance, args.config, plain.get("NodesExpanded"), symmetric.get("NodesExpanded"),
+                plain.get("Cost"), symmetric.get("Cost")])
@@ -0,0 +1,9 @@
+### Puts the modules shared by the GTSP and PCGTSP solvers (../common) on the
+### import path; imported by every script here before the shared modules
+
+import os
+import sys
+
+COMMON = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "common")
+if COMMON not in sys.path:
+    sys.path.append(COMMON)
@@ -1,18 +1,161 @@
 #!/usr/bin/env python3
 
-import argparse
-import copy
+import collections
+import logging
+import threading
 import time
-import csv
-import os
 
 import didppy as dp
+import numpy as np
+import common_path  # noqa: F401
+import bound_tables
+import gtsp_heuristic
+import gtsp_reduction
+import gtsp_solver
+import instance_cache
+import profiling
 import read_gtsp
-
-start = time.perf_counter()
-
-
-def create_model(n, nClass, nodes, edges, classes):
+from gtsp_solver import Config, Result  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+
+def is_symmetric(distance_matrix):
+    """
+    :return: True if d[i][j] == d[j][i] for all i, j
+    """
+    distance_matrix = np.asarray(distance_matrix)
+    return bool((distance_matrix == distance_matrix.T).all())
+
+
+def closure(edges):
+    """
+    shortest path matrix; TSPLIB rounding breaks the triangle inequality on
+    most instances, so it is always computed
+    """
+    sp_start = time.perf_counter()
+    with profiling.phase("shortest paths"):
+        shortest_distance_matrix = bound_tables.shortest_paths(edges)
+    logger.info("Shortest paths: {:.3f}s".format(time.perf_counter() - sp_start))
+    return shortest_distance_matrix
+
+
+# Point-level matrices of the most recently used point sets, shared by
+# every clustering of the same points (e.g. 5eil51, 10eil51, 15eil51)
+point_data_cache = collections.OrderedDict()
+point_data_lock = threading.Lock()
+POINT_DATA_CACHE_SIZE = 4
+
+
+def point_data(instance, cache_dir=None):
+    """
+    distance and shortest path matrices of the point set of a parsed
+    instance, looked up by the hash of its coordinates (or explicit
+    weights) in memory, then in cache_dir, and computed otherwise
+    :return: dict of distance, shortest_distance and the point key
+    """
+    key = instance_cache.point_hash(instance)
+    with point_data_lock:
+        if key in point_data_cache:
+            point_data_cache.move_to_end(key)
+            logger.info("Point set reused {}".format(key))
+            return point_data_cache[key]
+
+    points = instance_cache.load(cache_dir, key) if cache_dir is not None else None
+    if points is None:
+        with profiling.phase("matrix"):
+            edges = instance.distance_matrix()
+        points = {"distance": edges, "shortest_distance": closure(edges)}
+        if cache_dir is not None:
+            instance_cache.store(cache_dir, key, points)
+    else:
+        logger.info("Point set loaded from cache {}".format(key))
+    points["key"] = key
+
+    # Computed outside of the lock, a point set computed twice meanwhile is stored once
+    with point_data_lock:
+        point_data_cache[key] = points
+        if len(point_data_cache) > POINT_DATA_CACHE_SIZE:
+            point_data_cache.popitem(last=False)
+    return points
+
+
+def select_start_class(classes, nClass):
+    """
+    the tour starts in the smallest class, its nodes are the values of
+    returnToLocation (the lowest label among equally small classes)
+    """
+    return int(np.bincount(np.asarray(classes), minlength=nClass).argmin())
+
+
+def relabel(classes, start_class):
+    """
+    :return: classes with the labels of class 0 and start_class swapped, the
+        objective does not depend on the labels
+    """
+    swap = np.arange(max(classes) + 1)
+    swap[[0, start_class]] = swap[[start_class, 0]]
+    return [int(c) for c in swap[np.asarray(classes)]]
+
+
+def preprocess(n, nClass, edges, classes, shortest_distance_matrix=None, allowed=None):
+    """
+    instance data the model needs beyond the distance matrix, only the
+    bound tables depend on the clustering
+    :param allowed: optional n x n bool mask of the arcs left by the reduction
+    :return: dict of shortest path matrix, min-distance bound tables and the
+        arc mask
+    """
+    if shortest_distance_matrix is None:
+        shortest_distance_matrix = closure(edges)
+
+    tables = bound_tables.compute(edges, classes, nClass, allowed)
+    return dict(tables, shortest_distance=shortest_distance_matrix, allowed=allowed)
+
+
+def read_instance(filename, cache_dir=None):
+    """
+    reads and preprocesses an instance, or memory-maps the arrays of an
+    earlier run from cache_dir; the point-level matrices are shared with
+    other instances on the same points
+    :return: n, nClass, nodes, edges, classes, tables
+    """
+    if cache_dir is not None:
+        key = instance_cache.instance_hash(filename)
+        cached = instance_cache.load(cache_dir, key)
+        if cached is not None:
+            points = instance_cache.load(cache_dir, str(cached.pop("point_key")))
+        if cached is not None and points is not None:
+            logger.info("Instance loaded from cache {}".format(key))
+            edges = points["distance"]
+            classes = cached.pop("classes")
+            n = len(edges)
+            nClass = int(cached.pop("nClass"))
+            tables = dict(cached, shortest_distance=points["shortest_distance"])
+            return n, nClass, list(range(n)), edges, classes, tables
+
+    points = {}
+
+    def distance_matrix(instance):
+        points.update(point_data(instance, cache_dir))
+        return points["distance"]
+
+    n, nClass, nodes, edges, classes = read_gtsp.read(filename, distance_matrix)
+    tables = preprocess(n, nClass, edges, classes, points["shortest_distance"])
+
+    if cache_dir is not None:
+        class_tables = {name: tables[name] for name in ("dtn", "dfn", "dtc", "dfc", "dnc", "dcn", "dcc", "hdc")}
+        instance_cache.store(cache_dir, key, dict(class_tables, classes=classes, nClass=nClass,
+            point_key=np.array(points["key"])))
+
+    return n, nClass, nodes, edges, classes, tables
+
+
+def create_model(n, nClass, nodes, edges, classes, tables=None, symmetric=False):
+    """
+    :param symmetric: the distance matrix (and the arc mask) is symmetric,
+        only one direction of every tour is searched
+    """
 #    model = dp.Model(float_cost=True)
     model = dp.Model()
 
@@ -23,20 +166,21 @@ def create_model(n, nClass, nodes, edges, classes):
     returnToLocation = model.add_element_var(object_type=customer, target=n)
     location = model.add_element_var(object_type=customer, target=n)
 
-    distance_matrix = [
-        [edges[i, j] if (i, j) in edges else 0 for j in nodes] for i in nodes
-    ]
+    # n x n int32 array from read_gtsp.read
+    distance_matrix = edges
 #    distance = model.add_float_table(distance_matrix)
     distance = model.add_int_table(distance_matrix)
     
-    shortest_distance_matrix = copy.deepcopy(distance_matrix)
-    for k in range(1, n):
-        for i in range(n):
-            for j in range(n):
-                d = shortest_distance_matrix[i][k] + shortest_distance_matrix[k][j]
-                if shortest_distance_matrix[i][j] > d:
-                    shortest_distance_matrix[i][j] = d
-    shortest_distance = model.add_int_table(shortest_distance_matrix)
+    if tables is None:
+        tables = preprocess(n, nClass, edges, classes)
+
+    shortest_distance = model.add_int_table(tables["shortest_distance"])
+
+    # Arcs removed by the reduction are not used by any transition, padded
+    # for the dummy location n
+    allowed = tables.get("allowed")
+    if allowed is not None:
+        arc = model.add_bool_table(np.pad(allowed, (0, 1)).tolist())
     
     
     
@@ -45,261 +189,304 @@ def create_model(n, nClass, nodes, edges, classes):
 
     model.add_base_case([location == n, unvisitedClasses.is_empty()])
 
+    # Tour direction: a tour and its reverse cost the same and visit any two
+    # classes other than class 0 in opposite order, only the tours that visit
+    # the first of the direction classes before the second are searched
+    if symmetric:
+        first_class, second_class = direction_classes(tables["dcc"], nClass)
+
 #    state_cost = dp.FloatExpr.state_cost()
     state_cost = dp.IntExpr.state_cost()
     name_to_customer = {}
 
    
-    # Transition: initial visit ----------------------------------
-    for i in range(0, n):
-        if (classes[i]==0):
-            name = "initVisit {}".format(i)
+    with profiling.phase("transitions"):
+        # Transition: initial visit ----------------------------------
+        for i in range(0, n):
+            if (classes[i]==0):
+                name = "initVisit {}".format(i)
+                name_to_customer[name] = i
+                init_visit = dp.Transition(
+                    name=name,
+                    cost=state_cost+0,
+                    effects=[
+                        (unvisitedClasses, unvisitedClasses.remove(classes[i])),
+                        (location, i),
+                        (returnToLocation, i),
+                    ],
+                    preconditions=[returnToLocation==n],
+                )
+                model.add_transition(init_visit)
+
+
+        # Transition: visit next node ----------------------------------
+        for i in range(0, n):
+            name = "visit {}".format(i)
             name_to_customer[name] = i
-            init_visit = dp.Transition(
+            preconditions = [unvisitedClasses.contains(classes[i]), returnToLocation<n]
+            if allowed is not None:
+                preconditions.append(arc[location, i])
+            effects = [
+                (unvisitedClasses, unvisitedClasses.remove(classes[i])),
+                (location, i),
+            ]
+            if symmetric and classes[i] == second_class:
+                preconditions.append(~unvisitedClasses.contains(first_class))
+            visit = dp.Transition(
                 name=name,
-                cost=state_cost+0,
-                effects=[
-                    (unvisitedClasses, unvisitedClasses.remove(classes[i])),
-                    (location, i),
-                    (returnToLocation, i),
-                ],
-                preconditions=[returnToLocation==n],
+                cost=distance[location, i] + state_cost,
+                effects=effects,
+                preconditions=preconditions,
             )
-            model.add_transition(init_visit)
+            model.add_transition(visit)
 
 
-    # Transition: visit next node ----------------------------------
-    for i in range(0, n):
-        name = "visit {}".format(i)
-        name_to_customer[name] = i
-        visit = dp.Transition(
+        # Transition: return to start node ----------------------------------
+        name = "return"
+        name_to_customer[name] = -1
+        preconditions = [unvisitedClasses.is_empty(), returnToLocation<n]
+        if allowed is not None:
+            preconditions.append(arc[location, returnToLocation])
+        return_to_depot = dp.Transition(
             name=name,
-            cost=distance[location, i] + state_cost,
-            effects=[
-                (unvisitedClasses, unvisitedClasses.remove(classes[i])),
-                (location, i),
-            ],
-            preconditions=[unvisitedClasses.contains(classes[i]), returnToLocation<n],
+            cost=distance[location, returnToLocation] + state_cost,
+            effects=[(location, n),
+                (returnToLocation,n)],
+            preconditions=preconditions,
         )
-        model.add_transition(visit)
-
-
-    # Transition: return to start node ----------------------------------
-    name = "return"
-    name_to_customer[name] = -1
-    return_to_depot = dp.Transition(
-        name=name,
-        cost=distance[location, returnToLocation] + state_cost,
-        effects=[(location, n),
-            (returnToLocation,n)],
-        preconditions=[unvisitedClasses.is_empty(), returnToLocation<n],
-    )
-    model.add_transition(return_to_depot)
+        model.add_transition(return_to_depot)
 
     # Dual bound: distance from retun location
     model.add_dual_bound((returnToLocation != n).if_then_else(shortest_distance[location,returnToLocation], 0))
    
+    dtn, dfn, dtc, dfc = tables["dtn"], tables["dfn"], tables["dtc"], tables["dfc"]
+
     # Distance to node i from any node in another class
-    dtn = [min(distance_matrix[i][j] for i in nodes if (classes[i] != classes[j])) for j in nodes]
     min_distance_to_node = model.add_int_table(dtn)
 
     # Distance to class k from any other class
-    dtc = [min(dtn[j] for j in nodes if classes[j]==k) for k in range(nClass)]
     min_distance_to_class = model.add_int_table(dtc)
 
-    # Bound: distance to unvistited classes + distance back to start node
-    model.add_dual_bound(min_distance_to_class[unvisitedClasses] + (returnToLocation != n).if_then_else(min_distance_to_node[returnToLocation], 0))
-
-
-
     # Distance from node i to any node in another class
-    dfn = [min(distance_matrix[j][i] for i in nodes if (classes[i] != classes[j])) for j in nodes]
     min_distance_from_node = model.add_int_table(dfn)
-    
+
     # Distance from class k to any other class
-    dfc = [min(dfn[j] for j in nodes if classes[j]==k) for k in range(nClass)]
     min_distance_from_class = model.add_int_table(dfc)
 
-    # Bound: distance from unvistited classes + distance from current location
-    model.add_dual_bound(min_distance_from_class[unvisitedClasses] + (location != n).if_then_else(min_distance_from_node[location], 0))
-
-
-
-#    # Half distance in-out node i
-#    hdn = [round(min(distance_matrix[i][j] for i in nodes if (classes[i] != classes[j]))/2 + min(distance_matrix[j][i] for i in nodes if (classes[i] != classes[j]))/2) for j in nodes]
-#    half_distance_node = model.add_int_table(hdn)
-#
-#    # Half distance in-out class k
-#    hdc = [min(hdn[j] for j in nodes if classes[j]==k) for k in range(nClass)]
-#    half_distance_class = model.add_int_table(hdc)
-#
-#    # Bound: half distance in-out unvistited classes + half distance out current location + half distance to retornToLocation
-#    model.add_dual_bound(half_distance_class[unvisitedClasses] + 
-#        round(
-#        (location != n).if_then_else(min_distance_from_node[location]/2, 0) +
-#        (returnToLocation!=n).if_then_else(min_distance_to_node[returnToLocation]/2, 0)))
-
-#    state = model.target_state
-#    print("Bound evaluation: {}".format(model.eval_dual_bound(state)))
- 
-    return model, name_to_customer
+    # Distance from node i to class k, and from class k to node i
+    min_distance_node_to_class = model.add_int_table(tables["dnc"])
+    min_distance_class_to_node = model.add_int_table(tables["dcn"])
 
+    # The next arc leaves location for an unvisited class and the last arc
+    # enters returnToLocation from one; with no class left both are the
+    # closing arc, bounded by the nearest other cluster
+    out_of_location = (location == n).if_then_else(0, unvisitedClasses.is_empty().if_then_else(
+        min_distance_from_node[location], min_distance_node_to_class.min(location, unvisitedClasses)))
+    into_return = (returnToLocation == n).if_then_else(0, unvisitedClasses.is_empty().if_then_else(
+        min_distance_to_node[returnToLocation], min_distance_class_to_node.min(unvisitedClasses, returnToLocation)))
 
-def solve(
-    instance_name,
-    model,
-    name_to_customer,
-    solver_name,
-    history,
-    time_limit=None,
-    seed=2023,
-    initial_beam_size=1,
-    threads=1,
-    parallel_type=0,
-):
-    if solver_name == "LNBS":
-        if parallel_type == 2:
-            parallelization_method = dp.BeamParallelizationMethod.Sbs
-        elif parallel_type == 1:
-            parallelization_method = dp.BeamParallelizationMethod.Hdbs1
-        else:
-            parallelization_method = dp.BeamParallelizationMethod.Hdbs2
-
-        solver = dp.LNBS(
-            model,
-            initial_beam_size=initial_beam_size,
-            seed=seed,
-            parallelization_method=parallelization_method,
-            threads=threads,
-            time_limit=time_limit,
-            quiet=False,
-        )
-    elif solver_name == "DD-LNS":
-        solver = dp.DDLNS(model, time_limit=time_limit, quiet=False, seed=seed)
-    elif solver_name == "FR":
-        solver = dp.ForwardRecursion(model, time_limit=time_limit, quiet=False)
-    elif solver_name == "BrFS":
-        solver = dp.BreadthFirstSearch(model, time_limit=time_limit, quiet=False)
-    elif solver_name == "CAASDy":
-        solver = dp.CAASDy(model, time_limit=time_limit, quiet=False)
-    elif solver_name == "DFBB":
-        solver = dp.DFBB(model, time_limit=time_limit, quiet=False)
-    elif solver_name == "CBFS":
-        solver = dp.CBFS(model, time_limit=time_limit, quiet=False)
-    elif solver_name == "ACPS":
-        solver = dp.ACPS(model, time_limit=time_limit, quiet=False)
-    elif solver_name == "APPS":
-        solver = dp.APPS(model, time_limit=time_limit, quiet=False)
-    elif solver_name == "DBDFS":
-        solver = dp.DBDFS(model, time_limit=time_limit, quiet=False)
-    else:
-        if parallel_type == 2:
-            parallelization_method = dp.BeamParallelizationMethod.Sbs
-        elif parallel_type == 1:
-            parallelization_method = dp.BeamParallelizationMethod.Hdbs1
-        else:
-            parallelization_method = dp.BeamParallelizationMethod.Hdbs2
-
-        solver = dp.CABS(
-            model,
-            initial_beam_size=initial_beam_size,
-            threads=threads,
-            parallelization_method=parallelization_method,
-            time_limit=time_limit,
-            quiet=False,
-        )
-
-    if solver_name == "FR":
-        solution = solver.search()
-    else:
-        with open(history, "w") as f:
-            is_terminated = False
-
-            while not is_terminated:
-                solution, is_terminated = solver.search_next()
-
-                if solution.cost is not None:
-                    f.write(
-                        "{}, {}\n".format(time.perf_counter() - start, solution.cost)
-                    )
-                    f.flush()
-
-    print("Search time: {}s".format(solution.time))
-    print("Expanded: {}".format(solution.expanded))
-    print("Generated: {}".format(solution.generated))
-
-    if solution.is_infeasible:
-        print("The problem is infeasible")
+    # Bound: distance to unvistited classes + distance back to start node
+    model.add_dual_bound(min_distance_to_class[unvisitedClasses] + into_return)
 
-        return None, None
-    else:
-        tour = []
+    # Bound: distance from unvistited classes + distance from current location
+    model.add_dual_bound(min_distance_from_class[unvisitedClasses] + out_of_location)
 
-        for t in solution.transitions:
-            tour.append(name_to_customer[t.name])
+    # In + out distance of class k (cheapest arcs into and out of one of its nodes)
+    in_out_distance_class = model.add_int_table(tables["hdc"])
 
-#        print(" ".join(map(str, tour[1:-1])))
+    # Bound: half in-out distance, every remaining arc is counted twice, once
+    # at each end, so the sum is halved and rounded up (costs are integral)
+    model.add_dual_bound((in_out_distance_class[unvisitedClasses] + out_of_location + into_return + 1) // 2)
 
-        print("best bound: {}".format(solution.best_bound))
-        print("cost: {}".format(solution.cost))
+    return model, name_to_customer
 
-        if solution.is_optimal:
-            print("optimal cost: {}".format(solution.cost))
 
-#Print to csv log
-        csv_file_path = 'log.csv'
-        
-        if not os.path.exists(csv_file_path):
-            with open(csv_file_path, 'a', newline='') as csvfile:
-                csv_writer = csv.writer(csvfile)
-                csv_writer.writerow(["Instance", "Cost", "Bound", "Opt", "Time", "NodesExpanded", "NodesGenerated"])        
+def direction_classes(dcc, nClass):
+    """
+    the two classes other than class 0 whose order fixes the direction of a
+    tour in the symmetric model: the closest pair, their order is decided
+    early in most tours
+    :param dcc: min distance between classes (from preprocess)
+    :return: first and second class
+    """
+    distances = np.array(dcc, dtype=np.float64)[1:nClass, 1:nClass]
+    np.fill_diagonal(distances, np.inf)
+    first, second = np.unravel_index(np.argmin(distances), distances.shape)
+    return int(first) + 1, int(second) + 1
+
+
+def orient(tour, classes, direction):
+    """
+    :param direction: first and second class from direction_classes
+    :return: the tour or its reverse, whichever visits the first class
+        before the second (the direction the symmetric model searches)
+    """
+    position = {classes[i]: k for k, i in enumerate(tour[:-1])}
+    first, second = direction
+    if position[first] > position[second]:
+        return tour[:1] + tour[-2:0:-1] + [-1]
+    return tour
+
+
+class Problem:
+    """
+    an instance as read (original node ids and classes, for reporting and
+    validation) and as modeled (after the reduction and the relabeling of
+    the start class)
+    """
+
+    def __init__(self, name, n, nClass, nodes, edges, classes, tables):
+        self.name = name
+        self.n = n
+        self.nClass = nClass
+        self.nodes = nodes
+        self.edges = edges
+        self.classes = classes
+        self.model_nodes = nodes
+        self.model_edges = edges
+        self.model_classes = classes
+        self.tables = tables
+        self.reduction = None
+        self.symmetric = False
+        self.start_class = 0
+
+    def to_model(self, tour):
+        """
+        :return: a tour with original node ids as a tour of the model
+        """
+        if self.reduction is not None:
+            tour = self.reduction.to_reduced(tour)
+        tour = read_gtsp.rotate(tour, self.model_classes)
+        if self.symmetric:
+            tour = orient(tour, self.model_classes, direction_classes(self.tables["dcc"], self.nClass))
+        return tour
+
+    def to_original(self, tour):
+        """
+        :return: a tour of the model with original node ids, started in the
+            original class 0
+        """
+        if tour is None:
+            return None
+        if self.reduction is not None:
+            tour = self.reduction.to_original(tour)
+        return read_gtsp.rotate(tour, self.classes)
+
+    def validate(self, tour, cost):
+        """
+        :param tour: tour with original node ids
+        """
+        return read_gtsp.validate(self.n, self.nClass, self.edges, self.classes, tour, cost)
+
+
+def prepare(filename, config):
+    """
+    parse and preprocess phases: reads the instance, reduces it and relabels
+    its start class as the config says
+    :return: Problem
+    """
+    with profiling.phase("read"):
+        n, nClass, nodes, edges, classes, tables = read_instance(filename, config.cache_dir)
+    problem = Problem(filename, n, nClass, nodes, edges, classes, tables)
+
+    with profiling.phase("preprocess"):
+        # With two classes a tour is its own reverse
+        problem.symmetric = config.symmetric and nClass > 2 and is_symmetric(edges)
+        if config.symmetric and not problem.symmetric:
+            logger.info("Distance matrix is not symmetric, symmetry breaking skipped")
+
+        # The model is built on the reduced instance, tours are reported with the original node ids
+        shortest_distance, allowed = tables["shortest_distance"], None
+        if config.reduce:
+            with profiling.phase("reduction"):
+                reduction = gtsp_reduction.reduce(edges, classes, nClass, symmetric=problem.symmetric)
+            problem.reduction = reduction
+            problem.model_nodes, problem.model_edges, problem.model_classes = reduction.nodes, reduction.edges, reduction.classes
+            # Shortest paths through removed nodes still bound the remaining path from below
+            shortest_distance = shortest_distance[np.ix_(reduction.kept, reduction.kept)]
+            allowed = reduction.allowed
+
+        # The start class is relabeled to class 0, tours are reported from the original class 0
+        if config.start_class == "auto":
+            problem.start_class = select_start_class(problem.model_classes, nClass)
+        else:
+            problem.start_class = int(config.start_class)
+        if problem.start_class != 0:
+            logger.info("Start class: {} ({} nodes)".format(problem.start_class,
+                np.count_nonzero(np.asarray(problem.model_classes) == problem.start_class)))
+            problem.model_classes = relabel(problem.model_classes, problem.start_class)
+
+        if problem.reduction is not None or problem.start_class != 0:
+            problem.tables = preprocess(len(problem.model_nodes), nClass, problem.model_edges, problem.model_classes,
+                shortest_distance, allowed)
+    return problem
+
+
+def build_model(problem):
+    """
+    model phase
+    :return: model and name_to_customer of the Problem
+    """
+    with profiling.phase("model"):
+        model, name_to_customer = create_model(
+            len(problem.model_nodes), problem.nClass, problem.model_nodes, problem.model_edges, problem.model_classes,
+            problem.tables, problem.symmetric
+        )
+    return model, name_to_customer
 
-    
-        with open(csv_file_path, 'a', newline='') as csvfile:
-            csv_writer = csv.writer(csvfile)
-            csv_writer.writerow([instance_name, solution.cost, solution.best_bound, solution.is_optimal, solution.time, solution.expanded, solution.generated])        
 
-        return tour, solution.cost
+def initial_tours(problem, config):
+    """
+    warm start from the reference tour and the heuristic of the config
+    :return: initial tour (in the model, None if there is none), its cost
+        and the primal bound
+    """
+    with profiling.phase("initial"):
+        initial_tour = None
+        initial_cost = None
+        primal_bound = config.primal_bound
+        if config.initial_tour is not None:
+            initial_tour = read_gtsp.read_tour(config.initial_tour, problem.classes)
+            initial_cost = read_gtsp.tour_cost(problem.edges, initial_tour)
+            if not problem.validate(initial_tour, initial_cost):
+                raise ValueError("The initial tour is invalid.")
+            if primal_bound is None or initial_cost < primal_bound:
+                primal_bound = initial_cost
+
+        if config.heuristic:
+            reduction = problem.reduction
+            with profiling.phase("heuristic"):
+                heuristic_tour, heuristic_cost = gtsp_heuristic.solve(
+                    problem.model_edges if reduction is None else reduction.forbidden_edges(), problem.model_classes,
+                    problem.nClass, time_limit=config.heuristic_time, seed=config.seeds[0]
+                )
+            heuristic_tour = problem.to_original(heuristic_tour)
+            if (heuristic_cost is not None and (initial_cost is None or heuristic_cost < initial_cost)
+                    and problem.validate(heuristic_tour, heuristic_cost)):
+                initial_tour, initial_cost = heuristic_tour, heuristic_cost
+                if primal_bound is None or initial_cost < primal_bound:
+                    primal_bound = initial_cost
+
+        if initial_tour is not None:
+            # Re-selected over the kept nodes if it uses removed ones, never more expensive
+            initial_tour = problem.to_model(initial_tour)
+            initial_cost = read_gtsp.tour_cost(problem.model_edges, initial_tour)
+            primal_bound = min(primal_bound, initial_cost)
+            logger.info("initial tour cost: {}".format(initial_cost))
+    return initial_tour, initial_cost, primal_bound
+
+
+def solve_instance(filename, config=None, **options):
+    """
+    parse, preprocess, model and search one GTSP instance, see
+    gtsp_solver.solve_instance for the options
+    :return: Result, the tour with original node ids
+    """
+    return gtsp_solver.solve_instance(filename, prepare, build_model, initial_tours, config, **options)
 
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument("input", type=str)
-    parser.add_argument("--time-out", default=1800, type=int)
-    parser.add_argument("--history", default="history.csv", type=str)
-    parser.add_argument("--config", default="CABS", type=str)
-    parser.add_argument("--seed", default=2023, type=int)
-    parser.add_argument("--non-zero-base-case", action="store_true")
-    parser.add_argument("--threads", default=1, type=int)
-    parser.add_argument("--initial-beam-size", default=1, type=int)
-    parser.add_argument("--parallel-type", default=0, type=int)
-    args = parser.parse_args()
-
-    n, nClass, nodes, edges, classes = read_gtsp.read(args.input)
-
-    model, name_to_customer = create_model(
-        n, nClass, nodes, edges, classes
-    )
-    tour, cost = solve(
-        args.input,
-        model,
-        name_to_customer,
-        args.config,
-        args.history,
-        time_limit=args.time_out,
-        seed=args.seed,
-        threads=args.threads,
-        initial_beam_size=args.initial_beam_size,
-        parallel_type=args.parallel_type,
-    )
-
-    
-    print("tour:")
-    print(tour)
-    print("cost:")
-    print(cost)
-    
-    if cost is not None and read_gtsp.validate(n, nClass, edges, classes, tour, cost):
-        print("The solution is valid.")
-    else:
-        print("The solution is invalid.")
+    parser = gtsp_solver.argument_parser()
+    parser.add_argument("--initial-tour", default=None, type=str)
+    parser.add_argument("--symmetric", action="store_true", help="search one direction of every tour on symmetric instances")
+    gtsp_solver.main(parser.parse_args(), solve_instance)
@@ -1,28 +1,73 @@
+import logging
+
+import common_path  # noqa: F401
+import profiling
 import tsp_file_parser as parser
-import math
 
-def read(filename):
-    parser.TSPParser(filename)
+logger = logging.getLogger(__name__)
+
+def read(filename, distance_matrix=None):
+    """
+    :param distance_matrix: optional function of the parsed instance that
+        returns its distance matrix, e.g. from a cache shared by instances
+        on the same points
+    """
+    with profiling.phase("parse"):
+        instance = parser.TSPParser(filename)
 
-    n = parser.TSPParser.dimension
-    nClass = parser.TSPParser.nClass
+    n = instance.dimension
+    nClass = instance.nClass
     
     nodes = list(range(n))
-    edges = {}
-    for i in range(n):
-        for j in range(n):
-            if i != j:
-                x1 = parser.TSPParser.tsp_cities_dict[i][0]
-                y1 = parser.TSPParser.tsp_cities_dict[i][1]
-                x2 = parser.TSPParser.tsp_cities_dict[j][0]
-                y2 = parser.TSPParser.tsp_cities_dict[j][1]
-                edges[i, j] = round(math.sqrt(pow(x1-x2, 2) + pow(y1-y2, 2)))
+
+    # n x n int32 array for the EDGE_WEIGHT_TYPE of the instance
+    if distance_matrix is None:
+        with profiling.phase("matrix"):
+            edges = instance.distance_matrix()
+    else:
+        edges = distance_matrix(instance)
    
-    classes = parser.TSPParser.classes
+    classes = instance.classes
 
     return n, nClass, nodes, edges, classes
 
 
+def read_tour(filename, classes):
+    """
+    reads a TSPLIB tour (e.g. from G-TOURS, also as archive.zip::member)
+    :return: the tour in the format of the solver: rotated to start in
+        class 0, followed by -1 for the return
+    """
+    tour = []
+    in_section = False
+    for line in parser.read_lines(filename):
+        for token in line.split():
+            if token == "TOUR_SECTION":
+                in_section = True
+            elif in_section:
+                if int(token) < 0:
+                    in_section = False
+                    break
+                tour.append(int(token) - 1)
+    return rotate(tour + [-1], classes)
+
+
+def rotate(tour, classes):
+    """
+    :param tour: tour in the format of the solver
+    :return: the same cycle started in class 0
+    """
+    nodes = tour[:-1]
+    start = next((k for k, i in enumerate(nodes) if classes[i] == 0), 0)
+    return nodes[start:] + nodes[:start] + [-1]
+
+
+def tour_cost(edges, tour):
+    """
+    :return: cost of a tour in the format of the solver
+    """
+    nodes = tour[:-1]
+    return sum(int(edges[nodes[k - 1], nodes[k]]) for k in range(len(nodes)))
 
 
 def validate(n, nClass, edges, classes, solution, cost, tolerance=1e-4):
@@ -33,23 +78,23 @@ def validate(n, nClass, edges, classes, solution, cost, tolerance=1e-4):
    
     for i in solution[1:-1]:
         if i < 0 or i > n - 1:
-            print("Customer {} does not exist".format(i))
+            logger.warning("Customer {} does not exist".format(i))
             return False
         if classes[i] in visitedClasses:
-            print("Customer {} is already visited".format(i))
+            logger.warning("Customer {} is already visited".format(i))
             return False
         visitedClasses.add(classes[i])
-        actual_cost += edges[previous, i]
+        actual_cost += int(edges[previous, i])
         previous = i
 
     if solution[-1] != -1:
-        print("The tour does not return to the start node")
+        logger.warning("The tour does not return to the start node")
         return False
 
-    actual_cost += edges[previous, start]
+    actual_cost += int(edges[previous, start])
 
     if len(visitedClasses) != nClass:
-        print(
+        logger.warning(
             "The number of visited classes is {}, but should be {}".format(
                 len(visitedClasses), nClass
             )
@@ -57,7 +102,7 @@ def validate(n, nClass, edges, classes, solution, cost, tolerance=1e-4):
         return False
 
     if abs(actual_cost - cost) > tolerance:
-        print(
+        logger.warning(
             "The cost of the solution {} mismatches the actual cost {}".format(
                 cost, actual_cost
             )
@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+
+### Parallel batch runner for the GTSP solver, see ../common/batch.py, e.g.
+###   python run_batch.py run-MOM-small.bat --config CABS CAASDy --time-out 1200
+
+import os
+
+import common_path  # noqa: F401
+import batch
+
+SOLVER_SCRIPT = "gtsp_didp.py"
+
+if __name__ == "__main__":
+    batch.main(os.path.join(os.path.dirname(os.path.abspath(__file__)), SOLVER_SCRIPT))
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+
+### Parallel batch runner shared by the solvers
+### Every job is one solver process on one instance and one configuration,
+### run in its own working directory under wall-clock and memory limits.
+### The rows of all jobs are collected into a single results file, and with
+### --db all their runs (configuration and phase timings included) into one
+### results store. Every solver directory has a run_batch.py that calls
+### main with its solver script.
+
+import argparse
+import csv
+import glob
+import itertools
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import progress
+import results_store
+import tsp_file_parser
+
+try:
+    import resource
+except ImportError:
+    # No rlimits on Windows, only the solver watches the memory limit
+    resource = None
+
+INSTANCE_EXTENSIONS = (".gtsp", ".pcglns")
+
+# The address space of a job is limited only as a backstop: it is far larger
+# than the resident memory the solver watches, and a tight rlimit would kill
+# the job before the solver can stop cleanly and keep its incumbent
+ADDRESS_SPACE_FACTOR = 2
+
+RESULT_FIELDS = [
+    "Instance", "Config", "Threads", "Seed", "InitialBeamSize", "Status",
+    "Cost", "Bound", "Opt", "Time", "TimeToBest", "NodesExpanded", "NodesGenerated",
+    "PeakRSS", "WorkersPeakRSS", "WallTime", "ReturnCode",
+]
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def expand_instances(patterns):
+    """
+    every argument is a glob, an archive.zip::glob over the archive members,
+    or a list file (e.g. the old .bat files) whose lines name one instance each
+    :return: instance paths in the given order, without duplicates
+    """
+    instances = []
+    for pattern in patterns:
+        if tsp_file_parser.is_archive_path(pattern):
+            archive, member_pattern = tsp_file_parser.split_archive_path(pattern)
+            matches = list(tsp_file_parser.archive_members(archive, member_pattern))
+        elif pattern.endswith(INSTANCE_EXTENSIONS):
+            matches = sorted(glob.glob(pattern)) or [pattern]
+        else:
+            matches = []
+            base = os.path.dirname(pattern)
+            with open(pattern) as f:
+                for line in f:
+                    for token in line.split():
+                        if token.endswith(INSTANCE_EXTENSIONS):
+                            matches.append(os.path.join(base, token.replace("\\", os.sep)))
+                            break
+        for path in matches:
+            if path not in instances:
+                instances.append(path)
+    return instances
+
+
+def absolute_path(instance):
+    """
+    jobs run in their own directory, so paths are made absolute
+    """
+    if tsp_file_parser.is_archive_path(instance):
+        archive, member = tsp_file_parser.split_archive_path(instance)
+        return os.path.abspath(archive) + tsp_file_parser.ARCHIVE_SEPARATOR + member
+    return os.path.abspath(instance)
+
+
+def limit_memory(process, memory_limit):
+    """
+    limits the address space of a started job to ADDRESS_SPACE_FACTOR times
+    memory_limit MB, where the platform can (prlimit on Linux); the solver
+    itself stops its search at memory_limit MB of resident memory
+    """
+    if memory_limit is None or resource is None or not hasattr(resource, "prlimit"):
+        return
+    size = ADDRESS_SPACE_FACTOR * memory_limit * 2 ** 20
+    try:
+        resource.prlimit(process.pid, resource.RLIMIT_AS, (size, size))
+    except ProcessLookupError:
+        pass
+
+
+def kill_job(process):
+    """
+    kills a solver process and every process it started
+    """
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    else:
+        process.kill()
+    process.wait()
+
+
+def run_job(job, args):
+    """
+    runs one solver process and reads back the run it stored
+    :return: dict with the RESULT_FIELDS of the job, and the stored run, its
+        phase timings and phase memory under "run", "timings" and "memory"
+    """
+    instance, config, threads, seed, beam_size = job
+    row = {
+        "Instance": instance,
+        "Config": config,
+        "Threads": threads,
+        "Seed": seed,
+        "InitialBeamSize": beam_size,
+    }
+    command = [
+        sys.executable,
+        os.path.abspath(args.solver_script),
+        absolute_path(instance),
+        "--time-out", str(args.time_out),
+        "--config", config,
+        "--threads", str(threads),
+        "--seed", str(seed),
+        "--initial-beam-size", str(beam_size),
+    ]
+    if args.memory_limit is not None:
+        # The solver stops its search before the limit and keeps the incumbent
+        command += ["--memory-limit", str(args.memory_limit)]
+    command += args.solver_args
+    wall_clock_limit = args.wall_clock_limit or args.time_out + 60
+
+    with tempfile.TemporaryDirectory(prefix="job-") as workdir:
+        output = open(job_log_path(args.log_dir, job), "w") if args.log_dir else subprocess.DEVNULL
+        job_start = time.perf_counter()
+        try:
+            # In its own process group, so that a timeout also stops its portfolio workers
+            process = subprocess.Popen(
+                command,
+                cwd=workdir,
+                stdout=output,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+            )
+            # Set from outside after the start, preexec_fn is not safe with the worker threads
+            limit_memory(process, args.memory_limit)
+            try:
+                row["ReturnCode"] = process.wait(timeout=wall_clock_limit)
+                row["Status"] = "ok" if process.returncode == 0 else "error"
+            except subprocess.TimeoutExpired:
+                kill_job(process)
+                row["ReturnCode"] = None
+                row["Status"] = "timeout"
+        finally:
+            if output is not subprocess.DEVNULL:
+                output.close()
+        row["WallTime"] = time.perf_counter() - job_start
+
+        store_path = os.path.join(workdir, "results.db")
+        runs = []
+        if os.path.exists(store_path):
+            with results_store.ResultsStore(store_path) as store:
+                runs = store.query("SELECT * FROM runs")
+                timings = store.timings(runs[-1]["run_id"]) if runs else {}
+                memory = store.memory(runs[-1]["run_id"]) if runs else {}
+        if runs:
+            run = runs[-1]
+            row.update({"Cost": run["cost"], "Bound": run["bound"], "Opt": str(bool(run["optimal"])), "Time": run["time"],
+                "NodesExpanded": run["expanded"], "NodesGenerated": run["generated"], "PeakRSS": run["peak_rss"],
+                "WorkersPeakRSS": run["workers_peak_rss"]})
+            row["run"] = run
+            row["timings"] = timings
+            row["memory"] = memory
+            progress_path = os.path.join(workdir, "progress.jsonl")
+            if os.path.exists(progress_path):
+                row["TimeToBest"] = progress.time_to_best(progress.read(progress_path))
+        elif row["Status"] == "error" and args.memory_limit is not None:
+            # A process killed at the address space limit leaves no row
+            row["Status"] = "error or memory"
+
+    return row
+
+
+def job_log_path(log_dir, job):
+    instance, config, threads, seed, beam_size = job
+    name = "{}-{}-t{}-s{}-b{}.log".format(os.path.basename(instance), config, threads, seed, beam_size)
+    return os.path.join(log_dir, name)
+
+
+def main(solver_script=None):
+    """
+    runs the batch given on the command line
+    :param solver_script: default of --solver-script, which is required without it
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("instances", nargs="+", type=str, help="globs or instance list files")
+    parser.add_argument("--solver-script", default=solver_script, required=solver_script is None, type=str)
+    parser.add_argument("--config", nargs="+", default=["CABS"], type=str)
+    parser.add_argument("--threads", nargs="+", default=[1], type=int)
+    parser.add_argument("--seed", nargs="+", default=[2023], type=int)
+    parser.add_argument("--initial-beam-size", nargs="+", default=[1], type=int)
+    parser.add_argument("--time-out", default=1200, type=int)
+    parser.add_argument("--wall-clock-limit", default=None, type=int, help="seconds, default time-out + 60")
+    parser.add_argument("--memory-limit", default=None, type=int, help="MB of resident memory per job, the solver stops before it")
+    parser.add_argument("--jobs", default=None, type=int)
+    parser.add_argument("--output", default="results.csv", type=str)
+    parser.add_argument("--log-dir", default=None, type=str)
+    parser.add_argument("--db", default=None, type=str, help="results store all runs are added to")
+    parser.add_argument("--solver-args", default="", type=str, help="further options passed on to the solver")
+    args = parser.parse_args()
+    args.solver_args = shlex.split(args.solver_args)
+
+    instances = expand_instances(args.instances)
+    jobs = list(itertools.product(instances, args.config, args.threads, args.seed, args.initial_beam_size))
+
+    # Threads per job x jobs must not exceed the cores
+    cores = available_cores()
+    max_jobs = max(1, cores // max(args.threads))
+    workers = min(args.jobs or max_jobs, max_jobs, len(jobs)) or 1
+    print("Jobs: {}, parallel: {}, cores: {}".format(len(jobs), workers, cores))
+
+    if args.log_dir:
+        os.makedirs(args.log_dir, exist_ok=True)
+
+    # Only this process writes the results file and the store
+    write_header = not os.path.exists(args.output)
+    store = results_store.ResultsStore(args.db) if args.db else None
+    with open(args.output, "a", newline="") as csvfile, ThreadPoolExecutor(max_workers=workers) as executor:
+        csv_writer = csv.DictWriter(csvfile, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+        if write_header:
+            csv_writer.writeheader()
+        futures = [executor.submit(run_job, job, args) for job in jobs]
+        for done, future in enumerate(as_completed(futures), 1):
+            row = future.result()
+            csv_writer.writerow(row)
+            csvfile.flush()
+            if store is not None and "run" in row:
+                store.add(row["run"], row["timings"], row["memory"])
+            print("[{}/{}] {} {} {} cost: {}".format(done, len(jobs), row["Status"], row["Instance"], row["Config"], row.get("Cost")))
+    if store is not None:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
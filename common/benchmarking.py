@@ -0,0 +1,196 @@
+### Benchmark suite with regression detection, shared by the solvers
+### Runs a fixed tier of instances through the batch runner (one process per
+### run, the phases timed by the solver) and compares every run with the
+### baseline of its instance in a results store and, where known, with the
+### best-known cost. Times are summarized by their shifted geometric mean;
+### the exit code is 1 when the suite got slower than the baseline by more
+### than the threshold or lost an optimal cost. Every solver directory has a
+### benchmark.py with its tiers of instances that calls main.
+
+import argparse
+import csv
+import math
+import os
+import shlex
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import batch
+import results_store
+
+# Time limits of the small, medium and large tiers of every solver
+TIME_OUTS = {"small": 60, "medium": 300, "large": 1200}
+
+# Seconds added to every time before the geometric mean, so that the many
+# very short runs do not dominate it
+SHIFT = 10.0
+
+
+def shifted_geometric_mean(values, shift=SHIFT):
+    """
+    :return: exp(mean(log(value + shift))) - shift, None without values
+    """
+    if not values:
+        return None
+    return math.exp(sum(math.log(value + shift) for value in values) / len(values)) - shift
+
+
+def baselines(store, source, shipped_logs):
+    """
+    :param source: SQL LIKE pattern of the source of the baseline runs
+    :param shipped_logs: log.csv files imported when the store has no log.csv runs yet
+    :return: dict of instance file name -> latest run of the source
+    """
+    rows = store.query("SELECT * FROM runs WHERE source LIKE ? ORDER BY created", (source,))
+    if not rows and source == "%log.csv":
+        for log in shipped_logs:
+            results_store.import_log(store, log)
+        rows = store.query("SELECT * FROM runs WHERE source LIKE ? ORDER BY created", (source,))
+    return {row["name"]: row for row in rows}
+
+
+def compare(row, baseline, best_known):
+    """
+    :return: list of regressions of one run against its baseline
+    """
+    regressions = []
+    if row.get("Cost") is None:
+        if baseline is not None and baseline["cost"] is not None:
+            regressions.append("no solution")
+        return regressions
+    if baseline is not None and baseline["optimal"] and row["Opt"] != "True":
+        regressions.append("not solved to optimality")
+    if baseline is not None and baseline["cost"] is not None and int(row["Cost"]) > baseline["cost"]:
+        regressions.append("cost {} > {}".format(row["Cost"], baseline["cost"]))
+    if best_known is not None and row["Opt"] == "True" and int(row["Cost"]) != best_known:
+        regressions.append("optimal cost {} != best known {}".format(row["Cost"], best_known))
+    return regressions
+
+
+def main(tiers, instance_path, solver_script, shipped_logs, best_known=None, add_arguments=None):
+    """
+    runs the tiers given on the command line and exits with 1 on a regression
+    :param tiers: dict of tier -> instance names
+    :param instance_path: function of an instance name and the parsed arguments returning its path
+    :param solver_script: default of --solver-script
+    :param shipped_logs: log.csv files of the default baseline
+    :param best_known: dict of instance name -> best-known cost, None if there are none
+    :param add_arguments: function adding solver specific arguments to the parser
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tier", nargs="+", default=["small"], choices=list(tiers))
+    parser.add_argument("--solver-script", default=solver_script, type=str)
+    parser.add_argument("--config", default="CABS", type=str)
+    parser.add_argument("--seed", default=2023, type=int)
+    parser.add_argument("--time-out", default=None, type=int, help="seconds, default by tier")
+    parser.add_argument("--wall-clock-limit", default=None, type=int, help="seconds, default time-out + 60")
+    parser.add_argument("--memory-limit", default=None, type=int, help="MB per job")
+    parser.add_argument("--jobs", default=1, type=int, help="parallel runs, more than one disturbs the times")
+    parser.add_argument("--repeats", default=1, type=int, help="runs per instance, the fastest one counts")
+    parser.add_argument("--db", default="benchmark.db", type=str, help="results store of the baselines and runs")
+    parser.add_argument("--baseline", default="%log.csv", type=str, help="SQL LIKE pattern of the baseline source")
+    parser.add_argument("--save-baseline", default=None, type=str, help="store the runs as baseline benchmark:<label>")
+    parser.add_argument("--threshold", default=0.1, type=float, help="allowed slowdown of the shifted geometric mean")
+    parser.add_argument("--output", default="benchmark.csv", type=str)
+    parser.add_argument("--log-dir", default=None, type=str)
+    parser.add_argument("--solver-args", default="", type=str, help="further options passed on to the solver")
+    if add_arguments is not None:
+        add_arguments(parser)
+    args = parser.parse_args()
+    solver_args = shlex.split(args.solver_args)
+
+    jobs = []
+    for tier in args.tier:
+        for name in tiers[tier]:
+            jobs += [(tier, instance_path(name, args))] * args.repeats
+    if args.log_dir:
+        os.makedirs(args.log_dir, exist_ok=True)
+
+    def run(job):
+        tier, instance = job
+        job_args = argparse.Namespace(**dict(vars(args), time_out=args.time_out or TIME_OUTS[tier], solver_args=solver_args))
+        return batch.run_job((instance, args.config, 1, args.seed, 1), job_args)
+
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        rows = list(executor.map(run, jobs))
+
+    # The fastest of the repeats of every instance
+    fastest = {}
+    for (tier, instance), row in zip(jobs, rows):
+        row["Tier"] = tier
+        previous = fastest.get(instance)
+        if previous is None or (row.get("Time") is not None and (previous.get("Time") is None or row["Time"] < previous["Time"])):
+            fastest[instance] = row
+
+    with results_store.ResultsStore(args.db) as store:
+        baseline_runs = baselines(store, args.baseline, shipped_logs)
+        if args.save_baseline:
+            for row in fastest.values():
+                if "run" in row:
+                    stored = {field: value for field, value in row["run"].items() if field != "run_id"}
+                    store.add(dict(stored, source="benchmark:" + args.save_baseline), row["timings"], row["memory"])
+    best_known = best_known or {}
+
+    print("{:22} {:>8} {:>8} {:>8} {:>8} {:>8} {:>8} {:>9} {:>9} {:>8} {:>10}  {}".format(
+        "Instance", "Cost", "Base", "Best", "Bound", "Read", "Model", "Search", "BaseTime", "ToBest", "Exp/s", "Regressions"))
+    times, baseline_times, rates, baseline_rates = [], [], [], []
+    regressions = {}
+    for instance, row in fastest.items():
+        name = results_store.instance_name(instance)
+        key = os.path.splitext(name)[0]
+        baseline = baseline_runs.get(name)
+        timings = row.get("timings", {})
+        rate = row["NodesExpanded"] / max(row["Time"], 1e-9) if row.get("Time") is not None else None
+        row.update({
+            "BaselineCost": baseline["cost"] if baseline else None,
+            "BaselineTime": baseline["time"] if baseline else None,
+            "BestKnown": best_known.get(key),
+            "ExpandedPerSecond": rate,
+        })
+        row.update({"Phase" + phase.capitalize(): seconds for phase, seconds in timings.items()})
+        found = compare(row, baseline, best_known.get(key))
+        if found:
+            regressions[name] = found
+
+        # Times are compared where both runs proved optimality, otherwise they are the time limit
+        if baseline is not None and baseline["optimal"] and row.get("Opt") == "True":
+            times.append(row["Time"])
+            baseline_times.append(baseline["time"])
+            if rate is not None and baseline["expanded"]:
+                rates.append(rate)
+                baseline_rates.append(baseline["expanded"] / max(baseline["time"], 1e-9))
+
+        print("{:22} {:>8} {:>8} {:>8} {:>8} {:>8} {:>8} {:>9} {:>9} {:>8} {:>10}  {}".format(
+            name, str(row.get("Cost")), str(row["BaselineCost"]), str(row["BestKnown"]), str(row.get("Bound")),
+            "{:.3f}".format(timings["read"]) if "read" in timings else "-",
+            "{:.3f}".format(timings["model"]) if "model" in timings else "-",
+            "{:.3f}".format(row["Time"]) if row.get("Time") is not None else row["Status"],
+            "{:.3f}".format(baseline["time"]) if baseline else "-",
+            "{:.3f}".format(row["TimeToBest"]) if row.get("TimeToBest") is not None else "-",
+            "{:.0f}".format(rate) if rate is not None else "-",
+            "; ".join(found)))
+
+    fields = ["Tier"] + batch.RESULT_FIELDS + ["BaselineCost", "BaselineTime", "BestKnown", "ExpandedPerSecond"]
+    fields += sorted({key for row in fastest.values() for key in row if key.startswith("Phase")})
+    with open(args.output, "w", newline="") as csvfile:
+        csv_writer = csv.DictWriter(csvfile, fieldnames=fields, extrasaction="ignore")
+        csv_writer.writeheader()
+        csv_writer.writerows(fastest.values())
+
+    failed = bool(regressions)
+    if times:
+        mean, baseline_mean = shifted_geometric_mean(times), shifted_geometric_mean(baseline_times)
+        ratio = mean / max(baseline_mean, 1e-9)
+        print("Shifted geometric mean time over {} instances: {:.3f}s, baseline {:.3f}s, ratio {:.3f}".format(
+            len(times), mean, baseline_mean, ratio))
+        if rates:
+            print("Geometric mean expanded/s: {:.0f}, baseline {:.0f}".format(
+                shifted_geometric_mean(rates, 0.0), shifted_geometric_mean(baseline_rates, 0.0)))
+        if ratio > 1 + args.threshold:
+            print("Slower than the baseline by more than {:.0%}".format(args.threshold))
+            failed = True
+    else:
+        print("No instance solved to optimality by both the run and the baseline, times not compared")
+    if regressions:
+        print("Regressions on {} instances".format(len(regressions)))
+    sys.exit(1 if failed else 0)
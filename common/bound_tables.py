@@ -0,0 +1,102 @@
+### Dual bound tables shared by the GTSP and PCGTSP models
+### Minimum arc weights into and out of every node and class, between nodes
+### and classes and between classes, computed with vectorized numpy kernels
+### over an optional mask of usable arcs, and the shortest path closure.
+
+import numpy as np
+import profiling
+
+# Minimum of an empty set of arcs, large enough to prune the states that need
+# such an arc and small enough that a few of them sum up within int32
+UNREACHABLE = np.iinfo(np.int32).max // 4
+
+
+def shortest_paths(distance_matrix, block=256):
+    """
+    Floyd-Warshall closure, vectorized over rows and processed in row blocks
+    :return: n x n array of shortest path distances
+    """
+    shortest = np.array(distance_matrix, copy=True)
+    n = len(shortest)
+    for k in range(n):
+        row = shortest[k].copy()
+        for lo in range(0, n, block):
+            rows = shortest[lo:lo+block]
+            np.minimum(rows, rows[:, k:k+1] + row, out=rows)
+    return shortest
+
+
+def min_distance_tables(distance_matrix, node_class, nClass, allowed=None):
+    """
+    minimum inter-class arc weights into / out of every node and class
+    :param node_class: class index of every node
+    :param allowed: optional n x n bool mask of usable arcs
+    :return: dtn, dfn, dtc, dfc as int32 arrays (0 where no arc is usable)
+    """
+    node_class = np.asarray(node_class)
+    mask = node_class[:, np.newaxis] != node_class[np.newaxis, :]
+    if allowed is not None:
+        mask &= allowed
+    big = np.iinfo(np.int32).max
+    masked = np.where(mask, distance_matrix, big).astype(np.int32)
+
+    # Column minima: cheapest arc into node j, row minima: cheapest arc out of node j
+    dtn = masked.min(axis=0)
+    dfn = masked.min(axis=1)
+
+    # Grouped minima over the nodes of each class
+    dtc = np.full(nClass, big, dtype=np.int32)
+    np.minimum.at(dtc, node_class, dtn)
+    dfc = np.full(nClass, big, dtype=np.int32)
+    np.minimum.at(dfc, node_class, dfn)
+
+    for table in (dtn, dfn, dtc, dfc):
+        table[table == big] = 0
+    return dtn, dfn, dtc, dfc
+
+
+def node_class_tables(distance_matrix, node_class, nClass, allowed=None):
+    """
+    minimum arc weights between every node and every other class
+    :param allowed: optional n x n bool mask of usable arcs
+    :return: dnc (n x nClass, node to class), dcn (nClass x n, class to
+        node) and dcc (nClass x nClass, class to class) as int32 arrays,
+        UNREACHABLE for the own class and where no arc is usable
+    """
+    node_class = np.asarray(node_class)
+    mask = node_class[:, np.newaxis] != node_class[np.newaxis, :]
+    if allowed is not None:
+        mask &= allowed
+    masked = np.where(mask, distance_matrix, UNREACHABLE).astype(np.int32)
+
+    # Group the columns (rows) by class and reduce every group
+    order = np.argsort(node_class, kind="stable")
+    starts = np.searchsorted(node_class[order], np.arange(nClass))
+    dnc = np.minimum.reduceat(masked[:, order], starts, axis=1)
+    dcn = np.minimum.reduceat(masked[order, :], starts, axis=0)
+    dcc = np.minimum.reduceat(dnc[order, :], starts, axis=0)
+    return dnc, dcn, dcc
+
+
+def half_in_out_tables(dtn, dfn, node_class, nClass):
+    """
+    cheapest arc into plus cheapest arc out of a node, minimized over the
+    nodes of every class
+    :return: hdc as an int32 array (twice the half in-out distance)
+    """
+    hdc = np.full(nClass, np.iinfo(np.int32).max, dtype=np.int32)
+    np.minimum.at(hdc, np.asarray(node_class), (dtn.astype(np.int64) + dfn).astype(np.int32))
+    return hdc
+
+
+def compute(distance_matrix, node_class, nClass, allowed=None):
+    """
+    bound tables phase
+    :param allowed: optional n x n bool mask of usable arcs
+    :return: dict of dtn, dfn, dtc, dfc, dnc, dcn, dcc and hdc
+    """
+    with profiling.phase("bound tables"):
+        dtn, dfn, dtc, dfc = min_distance_tables(distance_matrix, node_class, nClass, allowed)
+        dnc, dcn, dcc = node_class_tables(distance_matrix, node_class, nClass, allowed)
+        hdc = half_in_out_tables(dtn, dfn, node_class, nClass)
+    return {"dtn": dtn, "dfn": dfn, "dtc": dtc, "dfc": dfc, "dnc": dnc, "dcn": dcn, "dcc": dcc, "hdc": hdc}
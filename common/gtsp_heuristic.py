@@ -0,0 +1,287 @@
+### Construction and local search heuristic for (PC)GTSP
+### Gives a good tour in a second or two, whose cost is then handed to
+### the DIDP solvers as a primal bound.
+###
+### A tour is kept as the sequence of chosen nodes, one per class, with
+### position 0 fixed in class 0 (where the model starts). Moves:
+###  - nearest-cluster construction from every node of class 0
+###  - cluster optimization: best node of every class for a fixed class order
+###  - 2-opt (symmetric instances without precedences)
+###  - Or-opt: move a segment of 1-3 classes to its best position
+###  - iterated local search from double-bridge / random segment moves
+### All deltas are evaluated on the distance matrix with NumPy.
+
+import logging
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Forbidden arcs (-1 in PCGTSP instances) cost this much during the search
+FORBIDDEN = 10 ** 9
+
+# Largest 3D array built by the cluster optimization DP
+MAX_DP_ELEMENTS = 1 << 22
+
+
+class Instance:
+    """
+    distance matrix and class structure in the form the moves need
+    """
+
+    def __init__(self, edges, classes, nClass, precedences=None):
+        self.nClass = nClass
+        self.node_class = np.asarray(classes)
+        self.members = [np.flatnonzero(self.node_class == c) for c in range(nClass)]
+        self.distance = np.where(np.asarray(edges) < 0, FORBIDDEN, edges).astype(np.int64)
+
+        # (from, to) class pairs, class 0 is always first in the model
+        if precedences is None:
+            precedences = np.empty((0, 2), dtype=np.int64)
+        precedences = np.asarray(precedences, dtype=np.int64).reshape(-1, 2)
+        self.precedences = precedences[precedences[:, 1] != 0]
+        self.predecessor_count = np.bincount(self.precedences[:, 1], minlength=nClass)
+        self.successors = [self.precedences[self.precedences[:, 0] == c, 1] for c in range(nClass)]
+
+        self.symmetric = (self.distance == self.distance.T).all()
+
+    def cost(self, tour):
+        tour = np.asarray(tour)
+        return int(self.distance[tour, np.roll(tour, -1)].sum())
+
+    def is_feasible_order(self, tour):
+        """
+        :return: True if the classes of the tour respect all precedences
+        """
+        if len(self.precedences) == 0:
+            return True
+        position = np.empty(self.nClass, dtype=np.int64)
+        position[self.node_class[tour]] = np.arange(len(tour))
+        return bool((position[self.precedences[:, 0]] < position[self.precedences[:, 1]]).all())
+
+
+def construct(instance, start_node):
+    """
+    nearest-cluster tour from start_node: always go to the closest node of a
+    class that is not visited yet and whose predecessors are all visited
+    :return: tour or None if it got stuck at forbidden arcs
+    """
+    distance = instance.distance
+    node_class = instance.node_class
+    visited = np.zeros(instance.nClass, dtype=bool)
+    waiting = instance.predecessor_count.copy()
+    tour = [start_node]
+    visited[0] = True
+    for c in instance.successors[0]:
+        waiting[c] -= 1
+    current = start_node
+    for _ in range(instance.nClass - 1):
+        available = (~visited & (waiting == 0))[node_class]
+        row = np.where(available, distance[current], FORBIDDEN + 1)
+        current = int(row.argmin())
+        if row[current] >= FORBIDDEN:
+            return None
+        tour.append(current)
+        c = node_class[current]
+        visited[c] = True
+        waiting[instance.successors[c]] -= 1
+    return tour
+
+
+def optimize_nodes(instance, tour):
+    """
+    cluster optimization: shortest cycle through the classes of the tour in
+    their current order, one node per class (layered DP started from the
+    smallest class)
+    :return: tour with the best node of every class
+    """
+    distance = instance.distance
+    order = instance.node_class[tour]
+    m = len(order)
+    shift = int(np.argmin([len(instance.members[c]) for c in order]))
+    order = np.roll(order, -shift)
+    layers = [instance.members[c] for c in order]
+    first = layers[0]
+
+    best_cost = None
+    best_nodes = None
+    chunk = max(1, MAX_DP_ELEMENTS // max(len(a) * len(b) for a, b in zip(layers, layers[1:] + layers[:1])))
+    for lo in range(0, len(first), chunk):
+        starts = first[lo:lo + chunk]
+        # cost[s, v]: cheapest path from starts[s] to node v of the current layer
+        cost = np.where(np.eye(len(starts), dtype=bool), 0, FORBIDDEN * m)
+        back = []
+        previous = starts
+        for layer in layers[1:]:
+            total = cost[:, :, np.newaxis] + distance[np.ix_(previous, layer)][np.newaxis, :, :]
+            arg = total.argmin(axis=1)
+            cost = np.take_along_axis(total, arg[:, np.newaxis, :], axis=1)[:, 0, :]
+            back.append(arg)
+            previous = layer
+        # Close the cycle back to the start node
+        closing = cost + distance[np.ix_(previous, starts)].T
+        last = closing.argmin(axis=1)
+        cycle = closing[np.arange(len(starts)), last]
+        s = int(cycle.argmin())
+        if best_cost is None or cycle[s] < best_cost:
+            best_cost = int(cycle[s])
+            index = [int(last[s])]
+            for arg in reversed(back[1:]):
+                index.append(int(arg[s, index[-1]]))
+            index.reverse()
+            best_nodes = [int(starts[s])] + [int(layer[k]) for layer, k in zip(layers[1:], index)]
+
+    nodes = best_nodes[-shift:] + best_nodes[:-shift] if shift else best_nodes
+    return nodes
+
+
+def two_opt(instance, tour):
+    """
+    best 2-opt move (segment reversal), symmetric instances only
+    :return: improved tour or None
+    """
+    distance = instance.distance
+    t = np.asarray(tour)
+    m = len(t)
+    if m < 4:
+        return None
+    before = np.roll(t, 1)
+    after = np.roll(t, -1)
+    # delta[i, j] for reversing t[i..j]
+    delta = (distance[np.ix_(before, t)] + distance[np.ix_(t, after)]
+             - distance[before, t][:, np.newaxis] - distance[t, after][np.newaxis, :])
+    delta[np.tril_indices(m)] = 0
+    delta[0, :] = 0
+    i, j = np.unravel_index(int(delta.argmin()), delta.shape)
+    if delta[i, j] >= 0:
+        return None
+    return list(t[:i]) + list(t[i:j + 1][::-1]) + list(t[j + 1:])
+
+
+def or_opt(instance, tour, max_length=3):
+    """
+    first improving Or-opt move: a segment of 1-3 positions is moved to the
+    best place in the rest of the tour (kept in order, or reversed on
+    symmetric instances), position 0 stays fixed
+    :return: improved tour or None
+    """
+    distance = instance.distance
+    t = np.asarray(tour)
+    m = len(t)
+    for length in range(1, max_length + 1):
+        for i in range(1, m - length + 1):
+            segment = t[i:i + length]
+            rest = np.concatenate([t[:i], t[i + length:]])
+            p, q = t[i - 1], t[(i + length) % m]
+            a, b = segment[0], segment[-1]
+            removal = distance[p, a] + distance[b, q] - distance[p, q]
+            u = rest
+            v = np.roll(rest, -1)
+            base = distance[u, v]
+            candidates = [(distance[u, a] + distance[b, v] - base - removal, False)]
+            if instance.symmetric:
+                candidates.append((distance[u, b] + distance[a, v] - base - removal, True))
+            for delta, reverse in candidates:
+                for j in np.argsort(delta, kind="stable"):
+                    if delta[j] >= 0:
+                        break
+                    moved = segment[::-1] if reverse else segment
+                    new_tour = np.concatenate([rest[:j + 1], moved, rest[j + 1:]])
+                    if instance.is_feasible_order(new_tour):
+                        return list(new_tour)
+    return None
+
+
+def perturb(instance, tour, rng, attempts=10):
+    """
+    double bridge (A B C D -> A C B D) for random cut points after position
+    0, or, where precedences forbid that, a random segment moved elsewhere
+    :return: perturbed tour, None if no attempt respects the precedences
+    """
+    m = len(tour)
+    if m < 5:
+        return None
+    for attempt in range(2 * attempts):
+        if attempt < attempts:
+            i, j, k = np.sort(rng.choice(np.arange(1, m), size=3, replace=False))
+            candidate = tour[:i] + tour[j:k] + tour[i:j] + tour[k:]
+        else:
+            i = int(rng.integers(1, m))
+            length = int(rng.integers(1, min(3, m - i) + 1))
+            rest = tour[:i] + tour[i + length:]
+            j = int(rng.integers(1, len(rest) + 1))
+            candidate = rest[:j] + tour[i:i + length] + rest[j:]
+        if candidate != tour and instance.is_feasible_order(candidate):
+            return candidate
+    return None
+
+
+def local_search(instance, tour, time_left):
+    """
+    cluster optimization alternated with 2-opt / Or-opt until no move improves
+    :return: local optimum and its cost
+    """
+    cost = instance.cost(tour)
+    improved = True
+    while improved and time_left():
+        improved = False
+        candidate = optimize_nodes(instance, tour)
+        if instance.cost(candidate) < cost:
+            tour, cost = candidate, instance.cost(candidate)
+        while time_left():
+            candidate = None
+            if instance.symmetric and len(instance.precedences) == 0:
+                candidate = two_opt(instance, tour)
+            if candidate is None:
+                candidate = or_opt(instance, tour)
+            if candidate is None:
+                break
+            tour, cost = [int(i) for i in candidate], instance.cost(candidate)
+            improved = True
+    return tour, cost
+
+
+def solve(edges, classes, nClass, precedences=None, time_limit=2.0, seed=2023):
+    """
+    nearest-cluster construction and local search, then iterated local
+    search with random perturbations until the time limit
+    :param precedences: (from class, to class) pairs for PCGTSP
+    :return: tour in the format of the solver (start node in class 0, ...,
+        -1) and its cost, None, None if no feasible tour was found
+    """
+    heuristic_start = time.perf_counter()
+    instance = Instance(edges, classes, nClass, precedences)
+    rng = np.random.default_rng(seed)
+
+    def time_left():
+        return time.perf_counter() - heuristic_start < time_limit
+
+    tour = None
+    cost = None
+    for start_node in instance.members[0]:
+        candidate = construct(instance, int(start_node))
+        if candidate is not None:
+            candidate_cost = instance.cost(candidate)
+            if cost is None or candidate_cost < cost:
+                tour, cost = candidate, candidate_cost
+        if not time_left():
+            break
+    if tour is None:
+        return None, None
+
+    tour, cost = local_search(instance, tour, time_left)
+    failures = 0
+    while time_left() and failures < 100:
+        candidate = perturb(instance, tour, rng)
+        if candidate is None:
+            failures += 1
+            continue
+        candidate, candidate_cost = local_search(instance, candidate, time_left)
+        if candidate_cost < cost:
+            tour, cost = candidate, candidate_cost
+
+    if cost >= FORBIDDEN:
+        return None, None
+    logger.info("Heuristic: {} in {:.3f}s".format(cost, time.perf_counter() - heuristic_start))
+    return [int(i) for i in tour] + [-1], cost
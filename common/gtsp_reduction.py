@@ -0,0 +1,209 @@
+### GTSP instance reduction (Gutin and Karapetyan, GTSP Reduction Algorithms)
+### Removes nodes and arcs that an optimal tour does not need, before the
+### model is built:
+###  - vertex reduction: node r is dominated by node r' of the same class if
+###    d(x,r') + d(r',y) <= d(x,r) + d(r,y) for every predecessor x and
+###    successor y in two other classes, r' can then replace r in any tour
+###  - arc reduction: arc (u,r) is dropped if for no successor v the node r
+###    is the cheapest (then lowest index) way from u through its class to v
+### Both keep at least one optimal tour and never change the class order, so
+### they are valid with precedences too. Forbidden arcs (-1) stay forbidden.
+
+import logging
+import time
+
+import numpy as np
+import gtsp_heuristic
+
+logger = logging.getLogger(__name__)
+
+# Forbidden arcs (-1 in PCGTSP instances) cost this much during the reduction
+FORBIDDEN = 10 ** 9
+
+# Largest 3D array built by one step of the reductions
+MAX_BLOCK_ELEMENTS = 1 << 24
+
+# Arc reduction takes O(n^3) time, larger instances only get vertex reduction
+MAX_ARC_REDUCTION_NODES = 1000
+
+
+class Reduction:
+    """
+    reduced instance and the node mapping back to the original one
+    """
+
+    def __init__(self, edges, classes, nClass, kept, allowed):
+        self.nClass = nClass
+        self.original_classes = classes
+        # Original node id of every reduced node
+        self.kept = kept
+        self.n = len(kept)
+        self.nodes = list(range(self.n))
+        self.classes = [int(c) for c in np.asarray(classes)[kept]]
+        self.edges = np.ascontiguousarray(np.asarray(edges)[np.ix_(kept, kept)])
+        # n x n bool mask of the arcs that survived, None if all of them did
+        self.allowed = allowed
+
+    def forbidden_edges(self):
+        """
+        :return: the reduced distance matrix with -1 for the removed arcs
+        """
+        if self.allowed is None:
+            return self.edges
+        return np.where(self.allowed, self.edges, -1).astype(np.int32)
+
+    def to_original(self, tour):
+        """
+        :return: tour in the format of the solver with original node ids
+        """
+        if tour is None:
+            return None
+        return [int(self.kept[i]) if i >= 0 else i for i in tour]
+
+    def to_reduced(self, tour):
+        """
+        :return: tour with reduced node ids; a tour through a removed node or
+            arc is replaced by the best one through the kept nodes of its
+            classes in the same order, which is never more expensive
+        """
+        index = {int(i): k for k, i in enumerate(self.kept)}
+        if all(i < 0 or i in index for i in tour):
+            reduced = [index[i] if i >= 0 else i for i in tour]
+            nodes = reduced[:-1]
+            if self.allowed is None or all(self.allowed[nodes[k - 1], nodes[k]] for k in range(len(nodes))):
+                return reduced
+
+        instance = gtsp_heuristic.Instance(self.forbidden_edges(), self.classes, self.nClass)
+        order = [int(instance.members[self.original_classes[i]][0]) for i in tour[:-1]]
+        return [int(i) for i in gtsp_heuristic.optimize_nodes(instance, order)] + [-1]
+
+
+def inter_class_arcs(distance, node_class, allowed=None):
+    """
+    :return: number of usable arcs between different classes
+    """
+    mask = (node_class[:, np.newaxis] != node_class[np.newaxis, :]) & (distance < FORBIDDEN)
+    if allowed is not None:
+        mask &= allowed
+    return int(mask.sum())
+
+
+def dominated_nodes(distance, node_class, members, active):
+    """
+    dominance matrix of the active nodes of one class: dom[r, r'] is True if
+    r' can replace r between any two active nodes of two other classes
+    """
+    s = len(members)
+    outside = np.flatnonzero(active & (node_class != node_class[members[0]]))
+    # Group the neighbours by class for the per-class minima
+    outside = outside[np.argsort(node_class[outside], kind="stable")]
+    neighbour_class = node_class[outside]
+    starts = np.flatnonzero(np.r_[True, neighbour_class[1:] != neighbour_class[:-1]])
+    if len(starts) < 2:
+        return np.zeros((s, s), dtype=bool)
+
+    into = distance[np.ix_(outside, members)]
+    out_of = distance[np.ix_(members, outside)].T
+    dom = np.zeros((s, s), dtype=bool)
+    block = max(1, MAX_BLOCK_ELEMENTS // (len(outside) * s))
+    for lo in range(0, s, block):
+        r = slice(lo, min(lo + block, s))
+        # Arcs r cannot use anyway never speak against replacing r
+        gain_in = np.where((into[:, r] < FORBIDDEN)[:, :, np.newaxis], into[:, r, np.newaxis] - into[:, np.newaxis, :], FORBIDDEN)
+        gain_out = np.where((out_of[:, r] < FORBIDDEN)[:, :, np.newaxis], out_of[:, r, np.newaxis] - out_of[:, np.newaxis, :], FORBIDDEN)
+
+        # Cheapest gain over the predecessor class plus over a different successor class
+        best_in = np.minimum.reduceat(gain_in, starts, axis=0)
+        best_out = np.minimum.reduceat(gain_out, starts, axis=0)
+        order = np.argsort(best_out, axis=0)
+        first = np.take_along_axis(best_out, order[:1], axis=0)
+        second = np.take_along_axis(best_out, order[1:2], axis=0)
+        other_out = np.where(np.arange(len(starts))[:, np.newaxis, np.newaxis] == order[:1], second, first)
+        dom[r] = (best_in + other_out).min(axis=0) >= 0
+    np.fill_diagonal(dom, False)
+    return dom
+
+
+def reduce_vertices(distance, node_class, members):
+    """
+    removes dominated nodes class by class, a node is only removed in favour
+    of a node that stays
+    :return: bool mask of the nodes that stay
+    """
+    active = np.ones(len(node_class), dtype=bool)
+    for nodes in members:
+        if len(nodes) < 2:
+            continue
+        dom = dominated_nodes(distance, node_class, nodes, active)
+        stays = np.ones(len(nodes), dtype=bool)
+        for r in range(len(nodes)):
+            if (dom[r] & stays & (np.arange(len(nodes)) != r)).any():
+                stays[r] = False
+        active[nodes[~stays]] = False
+    return active
+
+
+def reduce_arcs(distance, node_class, members):
+    """
+    keeps arc (u, r) only if r is the first cheapest node of its class on a
+    path u -> class of r -> v for some v in a third class
+    :return: n x n bool mask of the arcs that stay
+    """
+    n = len(node_class)
+    allowed = np.ones((n, n), dtype=bool)
+    for nodes in members:
+        s = len(nodes)
+        if s < 2:
+            continue
+        other = node_class != node_class[nodes[0]]
+        kept = np.zeros((n, s), dtype=bool)
+        block = max(1, MAX_BLOCK_ELEMENTS // (s * n))
+        for lo in range(0, n, block):
+            u = np.arange(lo, min(lo + block, n))
+            through = distance[np.ix_(u, nodes)][:, :, np.newaxis] + distance[nodes][np.newaxis, :, :]
+            best = through.argmin(axis=1)
+            valid = other[u][:, np.newaxis] & other[np.newaxis, :] & (node_class[u][:, np.newaxis] != node_class[np.newaxis, :])
+            for k in range(s):
+                kept[u, k] = ((best == k) & valid).any(axis=1)
+        allowed[:, nodes] = kept | ~other[:, np.newaxis]
+    return allowed
+
+
+def reduce(edges, classes, nClass, vertices=True, arcs=True, symmetric=False):
+    """
+    vertex and then arc reduction of an instance, logs how much it shrank
+    :param edges: n x n distance matrix, -1 marks a forbidden arc
+    :param symmetric: keep the arc mask symmetric, so that the reverse of the
+        kept optimal tour is kept as well
+    :return: Reduction
+    """
+    reduction_start = time.perf_counter()
+    node_class = np.asarray(classes)
+    distance = np.where(np.asarray(edges) < 0, FORBIDDEN, edges).astype(np.int64)
+    members = [np.flatnonzero(node_class == c) for c in range(nClass)]
+    n = len(node_class)
+
+    # With two classes the predecessor and the successor are the same node
+    if nClass < 3:
+        vertices = arcs = False
+
+    active = reduce_vertices(distance, node_class, members) if vertices else np.ones(n, dtype=bool)
+    kept = np.flatnonzero(active)
+    distance = distance[np.ix_(kept, kept)]
+    node_class = node_class[kept]
+
+    allowed = None
+    if arcs and len(kept) <= MAX_ARC_REDUCTION_NODES:
+        allowed = reduce_arcs(distance, node_class, [np.flatnonzero(node_class == c) for c in range(nClass)])
+        if symmetric:
+            allowed |= allowed.T
+        if allowed.all():
+            allowed = None
+
+    arcs_before = inter_class_arcs(np.where(np.asarray(edges) < 0, FORBIDDEN, edges), np.asarray(classes))
+    arcs_after = inter_class_arcs(distance, node_class, allowed)
+    logger.info("Reduction: {} -> {} nodes ({:.1f}%), {} -> {} arcs ({:.1f}%) in {:.3f}s".format(
+        n, len(kept), 100 * (n - len(kept)) / max(n, 1),
+        arcs_before, arcs_after, 100 * (arcs_before - arcs_after) / max(arcs_before, 1),
+        time.perf_counter() - reduction_start))
+    return Reduction(edges, classes, nClass, kept, allowed)
@@ -0,0 +1,546 @@
+### Search driver shared by the GTSP and PCGTSP solvers
+### The solvers only read, preprocess and model their instances; this module
+### creates the DIDP solvers, runs a single search or a portfolio (with the
+### memory watchdog and fall-back), reports the outcome, writes the results
+### and provides the common command line.
+
+import argparse
+import csv
+import logging
+import os
+
+import didppy as dp
+import portfolio
+import profiling
+import progress
+import results_store
+
+logger = logging.getLogger(__name__)
+
+
+def tour_to_transitions(model, tour):
+    """
+    :param tour: start node, visited nodes, -1 (the format solve returns)
+    :return: the transitions of the model that follow the tour
+    """
+    transitions = {t.name: t for t in model.get_transitions()}
+    names = ["initVisit {}".format(tour[0])]
+    names += ["visit {}".format(i) for i in tour[1:-1]]
+    names.append("return")
+    return [transitions[name] for name in names]
+
+
+def create_solver(
+    model,
+    solver_name,
+    time_limit=None,
+    seed=2023,
+    initial_beam_size=1,
+    threads=1,
+    parallel_type=0,
+    primal_bound=None,
+    initial_solution=None,
+    quiet=False,
+):
+    if parallel_type == 2:
+        parallelization_method = dp.BeamParallelizationMethod.Sbs
+    elif parallel_type == 1:
+        parallelization_method = dp.BeamParallelizationMethod.Hdbs1
+    else:
+        parallelization_method = dp.BeamParallelizationMethod.Hdbs2
+
+    if solver_name == "LNBS":
+        return dp.LNBS(
+            model,
+            initial_beam_size=initial_beam_size,
+            seed=seed,
+            parallelization_method=parallelization_method,
+            threads=threads,
+            time_limit=time_limit,
+            quiet=quiet,
+            primal_bound=primal_bound,
+            initial_solution=initial_solution,
+        )
+    elif solver_name == "DD-LNS":
+        return dp.DDLNS(model, time_limit=time_limit, quiet=quiet, seed=seed, primal_bound=primal_bound, initial_solution=initial_solution)
+    elif solver_name == "FR":
+        return dp.ForwardRecursion(model, time_limit=time_limit, quiet=quiet)
+    elif solver_name == "BrFS":
+        return dp.BreadthFirstSearch(model, time_limit=time_limit, quiet=quiet, primal_bound=primal_bound)
+    elif solver_name == "CAASDy":
+        return dp.CAASDy(model, time_limit=time_limit, quiet=quiet, primal_bound=primal_bound)
+    elif solver_name == "DFBB":
+        return dp.DFBB(model, time_limit=time_limit, quiet=quiet, primal_bound=primal_bound)
+    elif solver_name == "CBFS":
+        return dp.CBFS(model, time_limit=time_limit, quiet=quiet, primal_bound=primal_bound)
+    elif solver_name == "ACPS":
+        return dp.ACPS(model, time_limit=time_limit, quiet=quiet, primal_bound=primal_bound)
+    elif solver_name == "APPS":
+        return dp.APPS(model, time_limit=time_limit, quiet=quiet, primal_bound=primal_bound)
+    elif solver_name == "DBDFS":
+        return dp.DBDFS(model, time_limit=time_limit, quiet=quiet, primal_bound=primal_bound)
+    else:
+        return dp.CABS(
+            model,
+            initial_beam_size=initial_beam_size,
+            threads=threads,
+            parallelization_method=parallelization_method,
+            time_limit=time_limit,
+            quiet=quiet,
+            primal_bound=primal_bound,
+        )
+
+
+class Result:
+    """
+    outcome of a search: tour in the format of the solver (None if no tour
+    was found), cost, best bound, optimality, search statistics, the seconds
+    spent in every phase and its peak memory (Python heap, RSS, RSS of the
+    portfolio workers) in bytes
+    """
+
+    def __init__(self, tour=None, cost=None, best_bound=None, is_optimal=False, is_infeasible=False,
+            time=0.0, expanded=0, generated=0):
+        self.tour = tour
+        self.cost = cost
+        self.best_bound = best_bound
+        self.is_optimal = is_optimal
+        self.is_infeasible = is_infeasible
+        self.time = time
+        self.expanded = expanded
+        self.generated = generated
+        self.timings = {}
+        self.peak_memory = {}
+        # Stopped at the memory limit
+        self.memory_out = False
+        # Tour checked against the instance as read, None without a tour
+        self.is_valid = None
+
+
+class Config:
+    """
+    settings of solve_instance, the defaults are those of the command line
+    :param solvers: solver configuration names, several run as a portfolio
+    :param symmetric: search one direction of every tour (GTSP only)
+    :param initial_tour: optional tour file of a warm start (GTSP only)
+    :param memory_limit: optional MB of resident memory, the search then runs
+        in a watched process and is stopped before the limit
+    :param memory_fallback: optional solver (e.g. CABS) that continues a
+        search stopped at the memory limit from its incumbent
+    """
+
+    def __init__(self, solvers=("CABS",), time_limit=1800, seeds=(2023,), threads=1, initial_beam_size=1,
+            parallel_type=0, cache_dir=None, reduce=False, symmetric=False, start_class="auto",
+            heuristic=False, heuristic_time=2.0, primal_bound=None, initial_tour=None,
+            memory_limit=None, memory_fallback=None):
+        self.solvers = list(solvers)
+        self.time_limit = time_limit
+        self.seeds = list(seeds)
+        self.threads = threads
+        self.initial_beam_size = initial_beam_size
+        self.parallel_type = parallel_type
+        self.cache_dir = cache_dir
+        self.reduce = reduce
+        self.symmetric = symmetric
+        self.start_class = start_class
+        self.heuristic = heuristic
+        self.heuristic_time = heuristic_time
+        self.primal_bound = primal_bound
+        self.initial_tour = initial_tour
+        self.memory_limit = memory_limit
+        self.memory_fallback = memory_fallback
+
+    @property
+    def is_portfolio(self):
+        return len(self.solvers) * len(self.seeds) > 1
+
+
+def search(
+    model,
+    name_to_customer,
+    solver_name,
+    time_limit=None,
+    seed=2023,
+    initial_beam_size=1,
+    threads=1,
+    parallel_type=0,
+    primal_bound=None,
+    initial_tour=None,
+    initial_cost=None,
+    on_solution=None,
+    quiet=True,
+):
+    """
+    search phase with one solver
+    :param on_solution: optional function of (cost, tour, best bound,
+        expanded, generated), called for every solution the solver finds
+    :return: Result, the tour in the format of the solver
+    """
+    # A known tour is the starting incumbent, its cost the primal bound
+    initial_solution = None
+    if initial_tour is not None:
+        initial_solution = tour_to_transitions(model, initial_tour)
+
+    solver = create_solver(
+        model,
+        solver_name,
+        time_limit=time_limit,
+        seed=seed,
+        initial_beam_size=initial_beam_size,
+        threads=threads,
+        parallel_type=parallel_type,
+        primal_bound=primal_bound,
+        initial_solution=initial_solution,
+        quiet=quiet,
+    )
+
+    if solver_name == "FR":
+        solution = solver.search()
+    else:
+        is_terminated = False
+        reported = None
+        while not is_terminated:
+            solution, is_terminated = solver.search_next()
+            # The final solution repeats the last one found
+            if solution.cost is not None and solution.cost != reported and on_solution is not None:
+                reported = solution.cost
+                on_solution(solution.cost, [name_to_customer[t.name] for t in solution.transitions],
+                    solution.best_bound, solution.expanded, solution.generated)
+
+    result = Result(time=solution.time, expanded=solution.expanded, generated=solution.generated)
+    if solution.cost is None and initial_cost is not None:
+        # Nothing better than the initial tour, which is optimal if the search completed
+        logger.info("No solution better than the initial tour found")
+        result.tour = initial_tour
+        result.cost = initial_cost
+        result.is_optimal = solution.is_infeasible and primal_bound >= initial_cost
+        result.best_bound = initial_cost if result.is_optimal else solution.best_bound
+    elif solution.is_infeasible:
+        result.is_infeasible = True
+    else:
+        result.tour = [name_to_customer[t.name] for t in solution.transitions]
+        result.cost = solution.cost
+        result.is_optimal = solution.is_optimal
+        result.best_bound = solution.best_bound
+    return result
+
+
+def search_portfolio(
+    model,
+    name_to_customer,
+    configs,
+    time_limit=None,
+    nClass=None,
+    initial_beam_size=1,
+    threads=1,
+    parallel_type=0,
+    primal_bound=None,
+    initial_tour=None,
+    initial_cost=None,
+    on_solution=None,
+    memory_limit=None,
+    quiet=True,
+):
+    """
+    search phase with the (solver name, seed) configurations in parallel
+    processes sharing the incumbent, see portfolio.run
+    :param memory_limit: optional MB of resident memory of all processes
+    :return: Result as search
+    """
+    def portfolio_solver(model, solver_name, time_limit, seed, primal_bound, initial_solution):
+        return create_solver(
+            model,
+            solver_name,
+            time_limit=time_limit,
+            seed=seed,
+            initial_beam_size=initial_beam_size,
+            threads=threads,
+            parallel_type=parallel_type,
+            primal_bound=primal_bound,
+            initial_solution=initial_solution,
+            quiet=quiet,
+        )
+
+    found = portfolio.run(
+        model,
+        name_to_customer,
+        portfolio_solver,
+        tour_to_transitions,
+        configs,
+        time_limit,
+        nClass + 1,
+        primal_bound=primal_bound,
+        initial_tour=initial_tour,
+        initial_cost=initial_cost,
+        on_solution=on_solution,
+        memory_limit=memory_limit * 2 ** 20 if memory_limit is not None else None,
+    )
+    result = Result(time=found["time"], expanded=found["expanded"], generated=found["generated"])
+    result.tour = found["tour"]
+    result.cost = found["cost"]
+    result.best_bound = found["best_bound"]
+    result.is_optimal = found["is_optimal"]
+    result.is_infeasible = found["is_infeasible"]
+    result.memory_out = found["memory_out"]
+    return result
+
+
+def fall_back(model, name_to_customer, stopped, config, nClass, primal_bound=None, on_solution=None, quiet=True):
+    """
+    continues a search stopped at the memory limit with the solver
+    config.memory_fallback for the rest of the time limit, from the
+    incumbent as initial tour and primal bound
+    :param stopped: Result of the stopped search
+    :return: Result of both searches
+    """
+    remaining = config.time_limit - stopped.time
+    if remaining <= 0:
+        return stopped
+    logger.info("Falling back to {} for the remaining {:.0f}s".format(config.memory_fallback, remaining))
+    if stopped.cost is not None and (primal_bound is None or stopped.cost < primal_bound):
+        primal_bound = stopped.cost
+    result = search_portfolio(
+        model,
+        name_to_customer,
+        [(config.memory_fallback, config.seeds[0])],
+        time_limit=remaining,
+        nClass=nClass,
+        threads=config.threads,
+        initial_beam_size=config.initial_beam_size,
+        parallel_type=config.parallel_type,
+        primal_bound=primal_bound,
+        initial_tour=stopped.tour,
+        initial_cost=stopped.cost,
+        on_solution=on_solution,
+        memory_limit=config.memory_limit,
+        quiet=quiet,
+    )
+    # The dual bound of the stopped search still holds
+    if not result.is_optimal and stopped.best_bound is not None and (
+            result.best_bound is None or stopped.best_bound > result.best_bound):
+        result.best_bound = stopped.best_bound
+    result.time += stopped.time
+    result.expanded += stopped.expanded
+    result.generated += stopped.generated
+    return result
+
+
+def report(result, primal_bound=None):
+    """
+    logs the statistics and the outcome of a search
+    """
+    logger.info("Search time: {}s".format(result.time))
+    logger.info("Expanded: {}".format(result.expanded))
+    logger.info("Generated: {}".format(result.generated))
+    if result.memory_out:
+        logger.info("Stopped at the memory limit")
+
+    if result.cost is None:
+        if primal_bound is not None and result.is_infeasible:
+            logger.info("No solution better than the primal bound {}".format(primal_bound))
+        elif result.is_infeasible:
+            logger.info("The problem is infeasible")
+        else:
+            logger.info("No solution found")
+        return
+
+    logger.info("best bound: {}".format(result.best_bound))
+    logger.info("cost: {}".format(result.cost))
+    if result.is_optimal:
+        logger.info("optimal cost: {}".format(result.cost))
+
+
+def write_log(instance_name, cost, best_bound, is_optimal, search_time, expanded, generated, csv_file_path="log.csv"):
+    """
+    appends one row to log.csv
+    """
+    if not os.path.exists(csv_file_path):
+        with open(csv_file_path, 'a', newline='') as csvfile:
+            csv_writer = csv.writer(csvfile)
+            csv_writer.writerow(["Instance", "Cost", "Bound", "Opt", "Time", "NodesExpanded", "NodesGenerated"])
+
+    with open(csv_file_path, 'a', newline='') as csvfile:
+        csv_writer = csv.writer(csvfile)
+        csv_writer.writerow([instance_name, cost, best_bound, is_optimal, search_time, expanded, generated])
+
+
+def solve_instance(filename, prepare, build_model, initial_tours, config=None, progress_file=None, results=None,
+        log_file=None, on_progress=None, profiler=None, quiet=True):
+    """
+    parse, preprocess, model and search one instance; nothing is printed or
+    written unless asked for (log records go to the logging module)
+    :param prepare: function of the file name and the Config returning the
+        Problem of the solver (nClass, to_original and validate)
+    :param build_model: function of the Problem returning the model and
+        name_to_customer
+    :param initial_tours: function of the Problem and the Config returning
+        the initial tour in the model, its cost and the primal bound
+    :param progress_file: optional JSONL file of the progress events, see
+        progress.Progress
+    :param results: optional results store (SQLite file) the run is added to
+    :param log_file: optional csv file the result row is appended to (old
+        format, no configuration)
+    :param on_progress: optional function of the event dict, called for the
+        initial tour, every improvement and the final result, tours with
+        original node ids
+    :param profiler: optional profiling.Profiler of the phases, by default
+        they are only timed
+    :param quiet: no progress output of the solvers
+    :return: Result, the tour with original node ids
+    """
+    if config is None:
+        config = Config()
+    if profiler is None:
+        profiler = profiling.Profiler()
+
+    with profiling.activate(profiler):
+        problem = prepare(filename, config)
+        model, name_to_customer = build_model(problem)
+        initial_tour, initial_cost, primal_bound = initial_tours(problem, config)
+
+        writer = progress.JsonlWriter(progress_file) if progress_file is not None else None
+        stream = progress.Progress([writer, on_progress])
+
+        def improved(cost, tour, best_bound=None, expanded=None, generated=None):
+            stream.event(cost, problem.to_original(tour), best_bound, expanded, generated)
+
+        try:
+            if initial_cost is not None:
+                improved(initial_cost, initial_tour)
+            with profiling.phase("search", python=False):
+                # A memory limit is watched from outside a solver process
+                if config.is_portfolio or config.memory_limit is not None:
+                    result = search_portfolio(
+                        model,
+                        name_to_customer,
+                        [(solver, seed) for solver in config.solvers for seed in config.seeds],
+                        time_limit=config.time_limit,
+                        nClass=problem.nClass,
+                        threads=config.threads,
+                        initial_beam_size=config.initial_beam_size,
+                        parallel_type=config.parallel_type,
+                        primal_bound=primal_bound,
+                        initial_tour=initial_tour,
+                        initial_cost=initial_cost,
+                        on_solution=improved,
+                        memory_limit=config.memory_limit,
+                        quiet=quiet,
+                    )
+                else:
+                    result = search(
+                        model,
+                        name_to_customer,
+                        config.solvers[0],
+                        time_limit=config.time_limit,
+                        seed=config.seeds[0],
+                        threads=config.threads,
+                        initial_beam_size=config.initial_beam_size,
+                        parallel_type=config.parallel_type,
+                        primal_bound=primal_bound,
+                        initial_tour=initial_tour,
+                        initial_cost=initial_cost,
+                        on_solution=improved,
+                        quiet=quiet,
+                    )
+                if result.memory_out and config.memory_fallback is not None:
+                    result = fall_back(model, name_to_customer, result, config, problem.nClass, primal_bound, improved, quiet)
+
+            report(result, primal_bound)
+            result.tour = problem.to_original(result.tour)
+            if result.cost is not None:
+                result.is_valid = problem.validate(result.tour, result.cost)
+            stream.event(result.cost, result.tour, result.best_bound, result.expanded, result.generated,
+                final=True, optimal=result.is_optimal, infeasible=result.is_infeasible, memory_out=result.memory_out)
+        finally:
+            if writer is not None:
+                writer.close()
+    result.timings = dict(profiler.timings)
+    result.peak_memory = profiler.memory()
+
+    if results is not None:
+        with results_store.ResultsStore(results) as store:
+            results_store.record(store, filename, config, result)
+    if log_file is not None and result.cost is not None:
+        write_log(filename, result.cost, result.best_bound, result.is_optimal, result.time, result.expanded,
+            result.generated, log_file)
+    return result
+
+
+def argument_parser():
+    """
+    :return: parser of the options every solver has, the solver adds its own
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input", type=str)
+    parser.add_argument("--time-out", default=1800, type=int)
+    parser.add_argument("--results", default="results.db", type=str, help="SQLite results store the run is added to")
+    parser.add_argument("--log-csv", default=None, type=str, help="also append the result row to this csv file")
+    parser.add_argument("--progress", default="progress.jsonl", type=str, help="JSONL file of the anytime progress events")
+    parser.add_argument("--config", default="CABS", type=str)
+    parser.add_argument("--seed", default=2023, type=int)
+    parser.add_argument("--non-zero-base-case", action="store_true")
+    parser.add_argument("--threads", default=1, type=int)
+    parser.add_argument("--initial-beam-size", default=1, type=int)
+    parser.add_argument("--parallel-type", default=0, type=int)
+    parser.add_argument("--cache", default=None, type=str)
+    parser.add_argument("--primal-bound", default=None, type=int)
+    parser.add_argument("--heuristic", action="store_true")
+    parser.add_argument("--heuristic-time", default=2.0, type=float)
+    parser.add_argument("--portfolio", nargs="+", default=None, type=str, help="solver configurations run in parallel")
+    parser.add_argument("--portfolio-seeds", nargs="+", default=None, type=int)
+    parser.add_argument("--reduce", action="store_true", help="remove dominated nodes and arcs before solving")
+    parser.add_argument("--start-class", default="auto", type=str, help="class of the start node, auto: the smallest allowed one")
+    parser.add_argument("--memory-limit", default=None, type=int, help="MB, the search is stopped cleanly before it")
+    parser.add_argument("--memory-fallback", default=None, type=str, help="solver continuing a search stopped at the memory limit, e.g. CABS")
+    parser.add_argument("--profile", action="store_true", help="trace the Python heap and profile the phases")
+    parser.add_argument("--profile-stats", default=None, type=str, help="write the cProfile statistics to this file")
+    return parser
+
+
+def main(args, solve_instance):
+    """
+    solves the instance of the parsed command line and prints the tour
+    :param solve_instance: function of the file name, the Config and the
+        keyword arguments of solve_instance
+    """
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    config = Config(
+        solvers=args.portfolio or [args.config],
+        time_limit=args.time_out,
+        seeds=(args.portfolio_seeds or [args.seed]) if args.portfolio else [args.seed],
+        threads=args.threads,
+        initial_beam_size=args.initial_beam_size,
+        parallel_type=args.parallel_type,
+        cache_dir=args.cache,
+        reduce=args.reduce,
+        symmetric=getattr(args, "symmetric", False),
+        start_class=args.start_class,
+        heuristic=args.heuristic,
+        heuristic_time=args.heuristic_time,
+        primal_bound=args.primal_bound,
+        initial_tour=getattr(args, "initial_tour", None),
+        memory_limit=args.memory_limit,
+        memory_fallback=args.memory_fallback,
+    )
+    profile = args.profile or args.profile_stats is not None
+    profiler = profiling.Profiler(trace_memory=profile, profile=profile)
+    try:
+        result = solve_instance(args.input, config, progress_file=args.progress, results=args.results,
+            log_file=args.log_csv, profiler=profiler, quiet=False)
+    except ValueError as error:
+        raise SystemExit(str(error))
+    if profile:
+        print(profiler.report())
+    if args.profile_stats is not None:
+        profiler.dump_stats(args.profile_stats)
+
+    print("tour:")
+    print(result.tour)
+    print("cost:")
+    print(result.cost)
+
+    if result.is_valid:
+        print("The solution is valid.")
+    else:
+        print("The solution is invalid.")
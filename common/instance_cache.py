@@ -0,0 +1,84 @@
+### On-disk cache of preprocessed instances
+### Every instance (and every point set) gets a directory named by a content hash,
+### holding one .npy file per array so later runs can memory-map them
+
+import hashlib
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import tsp_file_parser
+
+# Bump when the cached arrays change meaning, old entries are then ignored
+CACHE_VERSION = 7
+
+
+def content_hash(filename, prefix=b"", chunk_size=1 << 20):
+    """
+    :param filename: file or archive.zip::member
+    :return: hex digest of prefix and the file content
+    """
+    digest = hashlib.sha256(prefix)
+    if tsp_file_parser.is_archive_path(filename):
+        digest.update(tsp_file_parser.read_member(filename))
+        return digest.hexdigest()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def instance_hash(filename):
+    """
+    :param filename: file or archive.zip::member
+    :return: hex digest of the file content and the cache version
+    """
+    return content_hash(filename, "v{}".format(CACHE_VERSION).encode())
+
+
+def point_hash(instance):
+    """
+    key of the point set of a parsed instance, independent of its sets, so
+    instances that only differ in their clustering share one entry
+    :return: hex digest of the weight type and the coordinates (or weights)
+    """
+    digest = hashlib.sha256("v{}".format(CACHE_VERSION).encode())
+    digest.update("{} {} {}".format(instance.dimension, instance.edge_weight_type, instance.edge_weight_format).encode())
+    data = instance.coords if instance.weights is None else instance.weights
+    digest.update(np.ascontiguousarray(data).tobytes())
+    return "points-" + digest.hexdigest()
+
+
+def load(cache_dir, key):
+    """
+    memory-maps every array of a cache entry
+    :return: dict of name -> read-only array, None if the entry does not exist
+    """
+    path = os.path.join(cache_dir, key)
+    if not os.path.isdir(path):
+        return None
+    arrays = {}
+    for filename in os.listdir(path):
+        if filename.endswith(".npy"):
+            arrays[filename[:-4]] = np.load(os.path.join(path, filename), mmap_mode="r")
+    return arrays
+
+
+def store(cache_dir, key, arrays):
+    """
+    writes the arrays into a temporary directory and renames it into place,
+    so concurrent runs never see a partial entry
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, key)
+    if os.path.isdir(path):
+        return
+    tmp = tempfile.mkdtemp(dir=cache_dir, prefix=".tmp-")
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp, name + ".npy"), np.asarray(array))
+        os.rename(tmp, path)
+    except OSError:
+        # Another run stored the same entry first
+        shutil.rmtree(tmp, ignore_errors=True)
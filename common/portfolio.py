@@ -0,0 +1,255 @@
+### Solver portfolio
+### Several solver configurations and seeds run on the same model in parallel
+### processes (forked, so the model is built only once). They share the
+### incumbent: every improvement is written to shared memory and picked up by
+### the other processes as their primal bound. All processes are stopped as
+### soon as one proves optimality or the best dual bound meets the incumbent.
+### With a memory limit the parent watches the resident set size of the
+### processes and stops them before the limit is reached; the incumbent and
+### the bounds live in the parent and survive. A single configuration runs
+### the same way, so a memory-hungry exact solver can be stopped cleanly.
+
+import logging
+import multiprocessing
+import queue
+import time
+
+import progress
+
+logger = logging.getLogger(__name__)
+
+# Anytime solvers that are restarted with the shared incumbent after every round
+RESTARTED_SOLVERS = ("CABS", "LNBS", "DD-LNS")
+
+# Length of the first round in seconds, doubled every round, so restarting
+# loses at most half of the search time of the restarted solvers
+SYNC_INTERVAL = 5.0
+
+# Fraction of the memory limit at which the processes are stopped, the
+# rest is headroom for the growth between two checks
+MEMORY_MARGIN = 0.9
+
+# Seconds between two checks of the resident set size
+MEMORY_POLL = 0.25
+
+
+class Incumbent:
+    """
+    best cost and tour in shared memory, -1 as cost while there is none
+    """
+
+    def __init__(self, context, length, cost=None, tour=None):
+        self.lock = context.Lock()
+        self.cost = context.Value("q", -1, lock=False)
+        self.tour = context.Array("i", length, lock=False)
+        if cost is not None:
+            self.update(cost, tour)
+
+    def update(self, cost, tour):
+        """
+        :return: True if cost improves the incumbent
+        """
+        with self.lock:
+            if self.cost.value >= 0 and self.cost.value <= cost:
+                return False
+            self.cost.value = cost
+            if tour is not None:
+                self.tour[:] = tour
+            return True
+
+    def get(self):
+        """
+        :return: cost and tour, None, None while there is none
+        """
+        with self.lock:
+            if self.cost.value < 0:
+                return None, None
+            return self.cost.value, list(self.tour)
+
+
+def worker(index, model, name_to_customer, create_solver, tour_to_transitions, config, incumbent, events, counters, stop, time_limit, primal_bound, restart=True):
+    """
+    runs one configuration until it terminates, the time limit or the stop
+    event, and puts every improvement, every better dual bound and its final
+    state into events
+    :param counters: shared expanded / generated nodes of every worker
+    :param restart: restart the anytime solvers with the shared incumbent,
+        pointless without other workers
+    """
+    solver_name, seed = config
+    worker_start = time.perf_counter()
+    round_limit = SYNC_INTERVAL
+    expanded = 0
+    generated = 0
+    best_bound = None
+
+    while not stop.is_set():
+        # Start every round from the shared incumbent
+        shared_cost, shared_tour = incumbent.get()
+        bound = primal_bound
+        initial_solution = None
+        if shared_cost is not None and (bound is None or shared_cost < bound):
+            bound = shared_cost
+        if shared_cost is not None and shared_tour[0] >= 0:
+            initial_solution = tour_to_transitions(model, shared_tour)
+
+        remaining = time_limit - (time.perf_counter() - worker_start)
+        if remaining <= 0:
+            break
+        restarted = restart and solver_name in RESTARTED_SOLVERS and round_limit < remaining
+        solver = create_solver(
+            model,
+            solver_name,
+            time_limit=round_limit if restarted else remaining,
+            seed=seed,
+            primal_bound=bound,
+            initial_solution=initial_solution,
+        )
+
+        is_terminated = False
+        while not is_terminated and not stop.is_set():
+            solution, is_terminated = solver.search_next()
+            if solution.cost is not None:
+                tour = [name_to_customer[t.name] for t in solution.transitions]
+                if incumbent.update(solution.cost, tour):
+                    events.put({"worker": index, "cost": solution.cost, "tour": tour})
+            # Sent as it improves, a worker stopped at the memory limit sends no final event
+            if solution.best_bound is not None and (best_bound is None or solution.best_bound > best_bound):
+                best_bound = solution.best_bound
+                events.put({"worker": index, "bound": best_bound})
+            counters[2 * index] = expanded + solution.expanded
+            counters[2 * index + 1] = generated + solution.generated
+        expanded += solution.expanded
+        generated += solution.generated
+
+        # A search that completed proves the incumbent (or the primal bound) optimal
+        if solution.is_optimal or (solution.is_infeasible and not solution.time_out):
+            events.put({"worker": index, "proved": True, "done": True})
+            return
+        if not restarted:
+            break
+        round_limit *= 2
+
+    events.put({"worker": index, "bound": best_bound, "done": True})
+
+
+def run(
+    model,
+    name_to_customer,
+    create_solver,
+    tour_to_transitions,
+    configs,
+    time_limit,
+    tour_length,
+    primal_bound=None,
+    initial_tour=None,
+    initial_cost=None,
+    on_solution=None,
+    memory_limit=None,
+):
+    """
+    runs the configurations in parallel
+    :param configs: (solver name, seed) pairs, one process each
+    :param create_solver: function(model, solver_name, time_limit, seed,
+        primal_bound, initial_solution) returning a solver
+    :param tour_length: length of a tour in the solver format
+    :param on_solution: optional function of (cost, tour, best bound,
+        expanded, generated), called for every improvement of the incumbent
+    :param memory_limit: optional bytes of resident memory of this process
+        and the workers, the search stops at MEMORY_MARGIN of it
+    :return: dict with tour, cost, best_bound, is_optimal, is_infeasible, time,
+        expanded, generated and memory_out (stopped at the memory limit)
+    """
+    context = multiprocessing.get_context("fork")
+    incumbent = Incumbent(context, tour_length, initial_cost, initial_tour)
+    if initial_cost is None and primal_bound is not None:
+        # Only a bound, no tour to start from
+        incumbent.update(primal_bound, [-1] * tour_length)
+    events = context.Queue()
+    counters = context.Array("q", 2 * len(configs), lock=False)
+    stop = context.Event()
+    portfolio_start = time.perf_counter()
+
+    processes = []
+    for index, config in enumerate(configs):
+        process = context.Process(
+            target=worker,
+            args=(index, model, name_to_customer, create_solver, tour_to_transitions, config, incumbent, events, counters, stop, time_limit, primal_bound, len(configs) > 1),
+            daemon=True,
+        )
+        process.start()
+        processes.append(process)
+
+    cost, tour = incumbent.get()
+    bounds = [None] * len(configs)
+    running = set(range(len(configs)))
+    is_optimal = False
+    memory_out = False
+    if memory_limit is not None and progress.rss() is None:
+        logger.warning("Resident set size unknown on this platform, the memory limit is not enforced")
+        memory_limit = None
+    next_check = time.perf_counter()
+
+    while running:
+        if memory_limit is not None and time.perf_counter() >= next_check:
+            next_check = time.perf_counter() + MEMORY_POLL
+            used = progress.rss()
+            if used is not None and used >= MEMORY_MARGIN * memory_limit:
+                logger.info("Memory limit nearly reached ({:.0f} of {:.0f} MB), search stopped".format(
+                    used / 2 ** 20, memory_limit / 2 ** 20))
+                memory_out = True
+                break
+        try:
+            event = events.get(timeout=MEMORY_POLL if memory_limit is not None else 1.0)
+        except queue.Empty:
+            # A worker that died (e.g. out of memory) sends no final event
+            running = {i for i in running if processes[i].is_alive()}
+            continue
+
+        index = event["worker"]
+        if "cost" in event and (cost is None or event["cost"] < cost):
+            cost, tour = event["cost"], event["tour"]
+            if on_solution is not None:
+                on_solution(cost, tour, max([b for b in bounds if b is not None], default=None),
+                    sum(counters[0::2]), sum(counters[1::2]))
+            logger.info("{} {}: {}".format(configs[index][0], configs[index][1], cost))
+        if event.get("bound") is not None:
+            bounds[index] = event["bound"]
+        if event.get("done"):
+            running.discard(index)
+        if event.get("proved"):
+            logger.info("{} {} completed the search".format(configs[index][0], configs[index][1]))
+            is_optimal = True
+            break
+
+        best_bound = max([b for b in bounds if b is not None], default=None)
+        if cost is not None and best_bound is not None and best_bound >= cost:
+            logger.info("The dual bound meets the incumbent")
+            is_optimal = True
+            break
+
+    stop.set()
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+        process.join()
+
+    # The incumbent of the processes may be newer than the last event read
+    cost, tour = incumbent.get()
+    if tour is not None and tour[0] < 0:
+        tour = None
+    best_bound = max([b for b in bounds if b is not None], default=None)
+    if is_optimal and cost is not None:
+        best_bound = cost
+
+    return {
+        "tour": tour,
+        "cost": cost if tour is not None else None,
+        "best_bound": best_bound,
+        "is_optimal": is_optimal and tour is not None,
+        "is_infeasible": is_optimal and tour is None,
+        "time": time.perf_counter() - portfolio_start,
+        "expanded": sum(counters[0::2]),
+        "generated": sum(counters[1::2]),
+        "memory_out": memory_out,
+    }
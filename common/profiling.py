@@ -0,0 +1,199 @@
+### Phase profiling
+### Named phases (parse, matrix, shortest paths, bound tables, transitions,
+### model, search, ...) are timed where they run, into the profiler of the
+### current run (per thread and context, so runs in parallel threads keep
+### their phases apart). Phases nest, a phase that runs several times adds up. On
+### request the peak Python heap of every phase is traced (tracemalloc) and
+### the Python phases are profiled (cProfile). The resident set size of this
+### process and of its child processes (the portfolio workers) is sampled at
+### the start and end of every phase and polled while it runs, so the peaks
+### of a phase cover the native solver as well and are its own.
+
+import contextlib
+import contextvars
+import cProfile
+import io
+import pstats
+import time
+import threading
+import tracemalloc
+
+import progress
+
+# Seconds between two samples of the resident set size during a phase
+RSS_POLL = 0.1
+
+
+def rss_sample():
+    """
+    :return: resident set size of this process and the total of its live
+        child processes at the same moment in bytes, (None, None) where
+        /proc is not available
+    """
+    own = progress.process_rss()
+    if own is None:
+        return None, None
+    return own, sum(progress.process_rss(child) or 0 for child in progress.children())
+
+
+class Profiler:
+    """
+    seconds, peak Python heap, peak RSS and peak RSS of the child processes
+    of every phase of a run
+    :param trace_memory: trace the Python heap, slows Python code down;
+        tracemalloc and the RSS are per process, so they are only exact
+        with one run at a time
+    :param profile: profile the Python phases with cProfile
+    """
+
+    def __init__(self, trace_memory=False, profile=False):
+        self.trace_memory = trace_memory
+        self.stats = cProfile.Profile() if profile else None
+        self.timings = {}
+        self.python_peak = {}
+        self.rss_peak = {}
+        self.workers_peak = {}
+        # Open phases as [name, peak heap, peak RSS, peak RSS of the children so far]
+        self.open = []
+        self.lock = threading.Lock()
+        self.poller = None
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if self.stats is not None:
+            self.stats.enable()
+
+    def stop(self):
+        if self.stats is not None:
+            self.stats.disable()
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def heap_peak(self):
+        """
+        passes the heap peak since the last reset on to every open phase
+        """
+        if not (self.trace_memory and tracemalloc.is_tracing()):
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        for entry in self.open:
+            entry[1] = max(entry[1], peak)
+
+    def rss(self):
+        """
+        passes an RSS sample on to every open phase
+        """
+        own, workers = rss_sample()
+        if own is None:
+            return
+        with self.lock:
+            for entry in self.open:
+                entry[2] = own if entry[2] is None else max(entry[2], own)
+                entry[3] = workers if entry[3] is None else max(entry[3], workers)
+
+    def poll(self, stop):
+        while not stop.wait(RSS_POLL):
+            self.rss()
+
+    @contextlib.contextmanager
+    def phase(self, name, python=True):
+        """
+        times the block as phase name
+        :param python: False for phases in native code (the search), they
+            are left out of cProfile
+        """
+        self.heap_peak()
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        if self.stats is not None and not python:
+            self.stats.disable()
+        with self.lock:
+            self.open.append([name, 0, None, None])
+        self.rss()
+        # The outermost phase polls the RSS until it ends
+        if self.poller is None:
+            stop = threading.Event()
+            self.poller = (threading.Thread(target=self.poll, args=(stop,), daemon=True), stop)
+            self.poller[0].start()
+        phase_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.perf_counter() - phase_start
+            self.heap_peak()
+            self.rss()
+            with self.lock:
+                _, heap, rss, workers = self.open.pop()
+                outermost = not self.open
+            if outermost:
+                thread, stop = self.poller
+                stop.set()
+                thread.join()
+                self.poller = None
+            if self.trace_memory:
+                self.python_peak[name] = max(self.python_peak.get(name, 0), heap)
+            if rss is not None:
+                self.rss_peak[name] = max(self.rss_peak.get(name, 0), rss)
+                self.workers_peak[name] = max(self.workers_peak.get(name, 0), workers)
+            if self.stats is not None and not python:
+                self.stats.enable()
+
+    def memory(self):
+        """
+        :return: dict of phase -> (peak Python heap, peak RSS, peak RSS of
+            the child processes) in bytes, None where it was not measured
+        """
+        return {name: (self.python_peak.get(name), self.rss_peak.get(name), self.workers_peak.get(name))
+            for name in self.timings}
+
+    def report(self, top=20):
+        """
+        :return: table of the phases and the top functions of cProfile
+        """
+        lines = ["{:16} {:>10} {:>12} {:>12} {:>12}".format("Phase", "Seconds", "Heap MB", "Peak RSS MB", "Workers MB")]
+        for name, seconds in self.timings.items():
+            peaks = (self.python_peak.get(name), self.rss_peak.get(name), self.workers_peak.get(name))
+            lines.append("{:16} {:>10.3f} {:>12} {:>12} {:>12}".format(name, seconds,
+                *("{:.1f}".format(peak / 2 ** 20) if peak is not None else "-" for peak in peaks)))
+        if self.stats is not None:
+            output = io.StringIO()
+            pstats.Stats(self.stats, stream=output).sort_stats("cumulative").print_stats(top)
+            lines.append(output.getvalue())
+        return "\n".join(lines)
+
+    def dump_stats(self, path):
+        """
+        writes the cProfile statistics, e.g. for snakeviz or pstats
+        """
+        if self.stats is not None:
+            self.stats.dump_stats(path)
+
+
+# Profiler of the run in progress in this context, phases outside of a run
+# are not recorded
+current = contextvars.ContextVar("profiler", default=None)
+
+
+def phase(name, python=True):
+    """
+    times the block as phase name in the current profiler
+    """
+    profiler = current.get()
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.phase(name, python)
+
+
+@contextlib.contextmanager
+def activate(profiler):
+    """
+    makes profiler the current one of this context for the block
+    """
+    token = current.set(profiler)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        current.reset(token)
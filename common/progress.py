@@ -0,0 +1,169 @@
+### Anytime progress of a search as a stream of events
+### Every improvement of the incumbent becomes one event with the seconds
+### since the search started, cost, best bound, gap, expanded and generated
+### nodes, the resident set size and the tour. Events go to callbacks and to
+### JSONL files written by a background thread, so the search loop never
+### waits for the disk.
+
+import json
+import os
+import queue
+import threading
+import time
+
+try:
+    import resource
+except ImportError:
+    # No resource module on Windows, RSS is then not reported
+    resource = None
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def process_rss(pid="self"):
+    """
+    :return: resident set size of a process in bytes, None if unknown
+    """
+    try:
+        with open("/proc/{}/statm".format(pid)) as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def children(pid="self"):
+    """
+    :return: process ids of the child processes (Linux only, empty elsewhere)
+    """
+    pids = []
+    try:
+        for task in os.listdir("/proc/{}/task".format(pid)):
+            with open("/proc/{}/task/{}/children".format(pid, task)) as f:
+                pids += [int(child) for child in f.read().split()]
+    except OSError:
+        pass
+    return pids
+
+
+def rss():
+    """
+    resident set size of this process and its children (the portfolio
+    workers), the peak RSS where /proc is not available
+    :return: bytes, None if unknown
+    """
+    own = process_rss()
+    if own is None:
+        if resource is None:
+            return None
+        # ru_maxrss is in kilobytes on Linux, in bytes on macOS
+        scale = 1 if os.uname().sysname == "Darwin" else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    return own + sum(process_rss(child) or 0 for child in children())
+
+
+def gap(cost, bound):
+    """
+    :return: relative gap between cost and bound, None while one is unknown
+    """
+    if cost is None or bound is None:
+        return None
+    if cost == 0:
+        return 0.0 if bound >= 0 else None
+    return max(0.0, (cost - bound) / abs(cost))
+
+
+class Progress:
+    """
+    turns the solutions of a search into events and passes them on to every
+    sink, a sink is a function of the event dict
+    """
+
+    def __init__(self, sinks=()):
+        self.start = time.perf_counter()
+        self.sinks = [sink for sink in sinks if sink is not None]
+
+    def event(self, cost, tour, bound=None, expanded=None, generated=None, **fields):
+        """
+        :param fields: further entries of the event, e.g. the final status
+        :return: the event
+        """
+        event = {
+            "time": time.perf_counter() - self.start,
+            "cost": cost,
+            "bound": bound,
+            "gap": gap(cost, bound),
+            "expanded": expanded,
+            "generated": generated,
+            "rss": rss(),
+            "tour": tour,
+        }
+        event.update(fields)
+        for sink in self.sinks:
+            sink(event)
+        return event
+
+
+class JsonlWriter:
+    """
+    appends events to a JSONL file from a background thread, one line per
+    event, flushed whenever the queue runs empty
+    """
+
+    def __init__(self, path):
+        self.file = open(path, "w")
+        self.events = queue.Queue()
+        self.thread = threading.Thread(target=self.write, daemon=True)
+        self.thread.start()
+
+    def __call__(self, event):
+        self.events.put(event)
+
+    def write(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                break
+            self.file.write(json.dumps(event, default=int) + "\n")
+            if self.events.empty():
+                self.file.flush()
+        self.file.close()
+
+    def close(self):
+        """
+        writes the remaining events and closes the file
+        """
+        self.events.put(None)
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read(path):
+    """
+    :return: the events of a JSONL file, up to a line cut off by a killed
+        writer
+    """
+    events = []
+    with open(path) as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                break
+    return events
+
+
+def time_to_best(events):
+    """
+    :return: seconds until the best cost of the events was first reached,
+        None if there is no cost
+    """
+    found = [event for event in events if event["cost"] is not None]
+    if not found:
+        return None
+    best = min(event["cost"] for event in found)
+    return min(event["time"] for event in found if event["cost"] == best)
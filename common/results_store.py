@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+
+### Results store
+### Runs are kept in an SQLite database in WAL mode, so parallel jobs and
+### readers never block each other or mix rows. Every run records the
+### instance (path, file name and content hash), the solver configuration,
+### cost, bound, optimality, node counts, the peak RSS of the solver and of
+### its workers and the seconds and peak memory of every phase.
+### Rows are inserted in batches, one transaction per batch. The log.csv
+### files of earlier runs can be imported as baselines, e.g.
+###   python results_store.py --db results.db import ../GTSP_EUC_2D/log.csv ../pcgtsp/log.csv
+
+import argparse
+import csv
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+
+import instance_cache
+import tsp_file_parser
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created REAL,
+    source TEXT,
+    host TEXT,
+    instance TEXT,
+    name TEXT,
+    instance_hash TEXT,
+    solver TEXT,
+    config TEXT,
+    seed INTEGER,
+    threads INTEGER,
+    time_limit REAL,
+    cost INTEGER,
+    bound INTEGER,
+    optimal INTEGER,
+    infeasible INTEGER,
+    time REAL,
+    expanded INTEGER,
+    generated INTEGER,
+    peak_rss INTEGER,
+    workers_peak_rss INTEGER
+);
+CREATE INDEX IF NOT EXISTS runs_name ON runs (name);
+CREATE INDEX IF NOT EXISTS runs_instance_hash ON runs (instance_hash);
+CREATE TABLE IF NOT EXISTS phases (
+    run_id TEXT REFERENCES runs (run_id),
+    phase TEXT,
+    seconds REAL,
+    python_peak INTEGER,
+    rss_peak INTEGER,
+    workers_rss_peak INTEGER,
+    PRIMARY KEY (run_id, phase)
+);
+"""
+
+RUN_FIELDS = [
+    "run_id", "created", "source", "host", "instance", "name", "instance_hash", "solver", "config", "seed",
+    "threads", "time_limit", "cost", "bound", "optimal", "infeasible", "time", "expanded", "generated",
+    "peak_rss", "workers_peak_rss",
+]
+
+# Seconds a writer waits for the lock of another one
+BUSY_TIMEOUT = 60.0
+
+
+def instance_name(instance):
+    """
+    :return: file name of an instance path, archive member or Windows path
+    """
+    return instance.replace("\\", "/").split("/")[-1]
+
+
+class ResultsStore:
+    """
+    SQLite database of runs, rows are buffered and written batch_size at a
+    time (and on flush or close)
+    """
+
+    def __init__(self, path, batch_size=64):
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.runs = []
+        self.phases = []
+
+    def add(self, run, timings=None, memory=None):
+        """
+        :param run: dict with (some of) the RUN_FIELDS
+        :param timings: dict of phase name -> seconds
+        :param memory: dict of phase name -> (peak Python heap, peak RSS,
+            peak RSS of the child processes) in bytes
+        :return: run id
+        """
+        run = dict(run)
+        run.setdefault("run_id", uuid.uuid4().hex)
+        run.setdefault("created", time.time())
+        if run.get("instance") is not None:
+            run.setdefault("name", instance_name(run["instance"]))
+        if isinstance(run.get("config"), dict):
+            run["config"] = json.dumps(run["config"], sort_keys=True, default=str)
+        self.runs.append(tuple(run.get(field) for field in RUN_FIELDS))
+        memory = memory or {}
+        for phase, seconds in (timings or {}).items():
+            python_peak, rss_peak, workers_rss_peak = memory.get(phase, (None, None, None))
+            self.phases.append((run["run_id"], phase, seconds, python_peak, rss_peak, workers_rss_peak))
+        if len(self.runs) >= self.batch_size:
+            self.flush()
+        return run["run_id"]
+
+    def flush(self):
+        """
+        writes the buffered rows in one transaction
+        """
+        if not self.runs:
+            return
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO runs ({}) VALUES ({})".format(", ".join(RUN_FIELDS), ", ".join("?" * len(RUN_FIELDS))),
+                self.runs,
+            )
+            self.connection.executemany(
+                "INSERT INTO phases (run_id, phase, seconds, python_peak, rss_peak, workers_rss_peak) VALUES (?, ?, ?, ?, ?, ?)",
+                self.phases,
+            )
+        self.runs = []
+        self.phases = []
+
+    def query(self, sql, parameters=()):
+        """
+        :return: rows of a query as dicts, buffered rows are written first
+        """
+        self.flush()
+        cursor = self.connection.execute(sql, parameters)
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def timings(self, run_id):
+        """
+        :return: dict of phase name -> seconds of a run
+        """
+        return {row["phase"]: row["seconds"] for row in self.query(
+            "SELECT phase, seconds FROM phases WHERE run_id = ?", (run_id,))}
+
+    def memory(self, run_id):
+        """
+        :return: dict of phase name -> (peak Python heap, peak RSS, peak RSS
+            of the child processes) of a run
+        """
+        return {row["phase"]: (row["python_peak"], row["rss_peak"], row["workers_rss_peak"]) for row in self.query(
+            "SELECT phase, python_peak, rss_peak, workers_rss_peak FROM phases WHERE run_id = ?", (run_id,))}
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def record(store, instance, config, result, source="solver"):
+    """
+    adds the Result of solve_instance
+    :param config: Config of the run
+    :return: run id
+    """
+    try:
+        digest = instance_cache.content_hash(instance)
+    except OSError:
+        digest = None
+    peaks = [rss for _, rss, _ in result.peak_memory.values() if rss is not None]
+    workers = [rss for _, _, rss in result.peak_memory.values() if rss is not None]
+    return store.add({
+        "source": source,
+        "host": socket.gethostname(),
+        "instance": instance,
+        "instance_hash": digest,
+        "solver": "+".join(config.solvers),
+        "config": vars(config),
+        "seed": config.seeds[0] if len(config.seeds) == 1 else None,
+        "threads": config.threads,
+        "time_limit": config.time_limit,
+        "cost": int(result.cost) if result.cost is not None else None,
+        "bound": int(result.best_bound) if result.best_bound is not None else None,
+        "optimal": result.is_optimal,
+        "infeasible": result.is_infeasible,
+        "time": result.time,
+        "expanded": result.expanded,
+        "generated": result.generated,
+        "peak_rss": max(peaks) if peaks else None,
+        "workers_peak_rss": max(workers) if workers else None,
+    }, result.timings, result.peak_memory)
+
+
+def locate(instance, base):
+    """
+    finds the instance of a log row, relative to the log file or inside a
+    zip archive named after its first directory
+    :return: path or archive.zip::member, None if it is not there
+    """
+    path = instance.replace("\\", "/")
+    if os.path.exists(os.path.join(base, path)):
+        return os.path.join(base, path)
+    parts = path.split("/")
+    archive = os.path.join(base, parts[0] + ".zip")
+    if len(parts) > 1 and os.path.exists(archive):
+        members = list(tsp_file_parser.archive_members(archive, path))
+        members += tsp_file_parser.archive_members(archive, "*/" + parts[-1])
+        if members:
+            return members[0]
+    return None
+
+
+def import_log(store, path):
+    """
+    adds the rows of a log.csv (Instance, Cost, Bound, Opt, Time,
+    NodesExpanded, NodesGenerated) as runs with the log file as source
+    :return: number of rows
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    hashes = {}
+    count = 0
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            instance = row["Instance"]
+            if instance not in hashes:
+                located = locate(instance, base)
+                hashes[instance] = instance_cache.content_hash(located) if located is not None else None
+            store.add({
+                "source": os.path.abspath(path),
+                "instance": instance,
+                "instance_hash": hashes[instance],
+                "cost": int(row["Cost"]) if row["Cost"] else None,
+                "bound": int(row["Bound"]) if row["Bound"] else None,
+                "optimal": row["Opt"] == "True",
+                "infeasible": False,
+                "time": float(row["Time"]),
+                "expanded": int(row["NodesExpanded"]),
+                "generated": int(row["NodesGenerated"]),
+            })
+            count += 1
+    store.flush()
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default="results.db", type=str)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="add the rows of log.csv files")
+    import_parser.add_argument("logs", nargs="+", type=str)
+    show_parser = subparsers.add_parser("show", help="best cost and bound of every instance")
+    show_parser.add_argument("--name", default="%", type=str, help="SQL LIKE pattern of the instance file names")
+    args = parser.parse_args()
+
+    with ResultsStore(args.db) as store:
+        if args.command == "import":
+            for log in args.logs:
+                print("{}: {} runs".format(log, import_log(store, log)))
+        else:
+            rows = store.query(
+                "SELECT name, COUNT(*) AS runs, MIN(cost) AS cost, MAX(bound) AS bound, MAX(optimal) AS optimal "
+                "FROM runs WHERE name LIKE ? GROUP BY name ORDER BY name", (args.name,))
+            print("{:30} {:>6} {:>10} {:>10} {:>8}".format("Instance", "Runs", "Cost", "Bound", "Optimal"))
+            for row in rows:
+                print("{:30} {:>6} {:>10} {:>10} {:>8}".format(
+                    row["name"], row["runs"], str(row["cost"]), str(row["bound"]), bool(row["optimal"])))
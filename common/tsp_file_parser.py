@@ -0,0 +1,401 @@
+### Based on a TSPLIB parser of tsartsaris
+### https://github.com/tsartsaris/TSPLIB-python-parser
+### Modified to parse GTSP file format
+
+import fnmatch
+import functools
+import logging
+import os
+import threading
+import zipfile
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Instances inside a zip archive are addressed as archive.zip::member
+ARCHIVE_SEPARATOR = "::"
+_archives = {}
+_archive_lock = threading.Lock()
+
+
+def is_archive_path(path: str) -> bool:
+    return ARCHIVE_SEPARATOR in path
+
+
+def split_archive_path(path: str):
+    """
+    :return: archive path and member name of archive.zip::member
+    """
+    archive, _, member = path.partition(ARCHIVE_SEPARATOR)
+    return archive, member
+
+
+def open_archive(archive: str) -> zipfile.ZipFile:
+    """
+    archives stay open, so the central directory is read once per process
+    """
+    key = (os.path.abspath(archive), os.path.getmtime(archive))
+    if key not in _archives:
+        _archives[key] = zipfile.ZipFile(archive)
+    return _archives[key]
+
+
+@functools.lru_cache(maxsize=256)
+def _read_member(archive: str, mtime: float, member: str) -> bytes:
+    with _archive_lock:
+        return open_archive(archive).read(member)
+
+
+def read_member(path: str) -> bytes:
+    """
+    decompressed content of archive.zip::member, each member is decompressed
+    once and reused by repeated parses (until the archive changes)
+    """
+    archive, member = split_archive_path(path)
+    try:
+        return _read_member(os.path.abspath(archive), os.path.getmtime(archive), member)
+    except KeyError:
+        raise FileNotFoundError("No member {} in archive {}".format(member, archive)) from None
+
+
+def archive_members(archive: str, pattern: str = "*") -> Iterator[str]:
+    """
+    :return: archive.zip::member paths of the files matching pattern, in
+        archive order
+    """
+    with _archive_lock:
+        names = open_archive(archive).namelist()
+    for name in names:
+        if not name.endswith("/") and fnmatch.fnmatch(name, pattern):
+            yield archive + ARCHIVE_SEPARATOR + name
+
+
+def read_bytes(path: str) -> bytes:
+    """
+    :return: content of a file or of an archive.zip::member
+    """
+    if is_archive_path(path):
+        return read_member(path)
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def read_lines(path: str) -> List[str]:
+    """
+    :return: lines of a file or of an archive.zip::member
+    """
+    return read_bytes(path).decode().splitlines()
+
+
+class TokenStream:
+    """
+    single pass over the lines of a file, handing out either whole lines
+    (for the specification part) or whitespace separated tokens (for the
+    data sections, which may span any number of lines)
+    """
+
+    def __init__(self, lines: Iterable[str]) -> None:
+        self.lines = iter(lines)
+        self.pending = []
+
+    def line(self) -> Optional[str]:
+        """
+        :return: the rest of the current line, or the next line, None at the end
+        """
+        if self.pending:
+            rest = " ".join(reversed(self.pending))
+            self.pending = []
+            return rest
+        return next(self.lines, None)
+
+    def peek(self) -> Optional[str]:
+        """
+        :return: the next token without consuming it, None at the end
+        """
+        while not self.pending:
+            line = next(self.lines, None)
+            if line is None:
+                return None
+            self.pending = line.split()[::-1]
+        return self.pending[-1]
+
+    def token(self) -> Optional[str]:
+        """
+        :return: the next token, None at the end
+        """
+        if self.peek() is None:
+            return None
+        return self.pending.pop()
+
+    def tokens(self, count: int):
+        """
+        :return: generator over the next count tokens
+        """
+        for _ in range(count):
+            token = self.token()
+            if token is None:
+                raise ValueError("Unexpected end of file")
+            yield token
+
+
+def nint(x):
+    """
+    TSPLIB nearest integer, (int) (x + 0.5)
+    """
+    return np.floor(x + 0.5)
+
+
+def euc_2d(coords):
+    """
+    Euclidean distance rounded half to even (Python round, as in the shipped
+    logs), unlike nint this rounds an exact .5 down to an even integer
+    """
+    x, y = coords[:, 0], coords[:, 1]
+    dx = x[:, np.newaxis] - x
+    dy = y[:, np.newaxis] - y
+    return np.rint(np.sqrt(dx * dx + dy * dy))
+
+
+def ceil_2d(coords):
+    x, y = coords[:, 0], coords[:, 1]
+    return np.ceil(np.hypot(x[:, np.newaxis] - x, y[:, np.newaxis] - y))
+
+
+def man_2d(coords):
+    x, y = coords[:, 0], coords[:, 1]
+    return nint(np.abs(x[:, np.newaxis] - x) + np.abs(y[:, np.newaxis] - y))
+
+
+def max_2d(coords):
+    x, y = coords[:, 0], coords[:, 1]
+    return np.maximum(nint(np.abs(x[:, np.newaxis] - x)), nint(np.abs(y[:, np.newaxis] - y)))
+
+
+def att(coords):
+    """
+    pseudo-Euclidean distance, rounded up where nint rounds down
+    """
+    x, y = coords[:, 0], coords[:, 1]
+    dx = x[:, np.newaxis] - x
+    dy = y[:, np.newaxis] - y
+    r = np.sqrt((dx * dx + dy * dy) / 10.0)
+    t = nint(r)
+    return np.where(t < r, t + 1, t)
+
+
+def geo(coords):
+    """
+    great circle distance, coordinates are DDD.MM degrees and minutes
+    """
+    PI = 3.141592
+    RRR = 6378.388
+    deg = np.trunc(coords)
+    radians = PI * (deg + 5.0 * (coords - deg) / 3.0) / 180.0
+    latitude, longitude = radians[:, 0], radians[:, 1]
+    q1 = np.cos(longitude[:, np.newaxis] - longitude)
+    q2 = np.cos(latitude[:, np.newaxis] - latitude)
+    q3 = np.cos(latitude[:, np.newaxis] + latitude)
+    arc = np.arccos(np.clip(0.5 * ((1.0 + q1) * q2 - (1.0 - q1) * q3), -1.0, 1.0))
+    d = np.trunc(RRR * arc + 1.0)
+    np.fill_diagonal(d, 0)
+    return d
+
+
+COORD_KERNELS = {
+    "EUC_2D": euc_2d,
+    "CEIL_2D": ceil_2d,
+    "MAN_2D": man_2d,
+    "MAX_2D": max_2d,
+    "ATT": att,
+    "GEO": geo,
+}
+
+
+def triangle_indices(n, weight_format):
+    """
+    row-major positions filled by a triangular EDGE_WEIGHT_FORMAT, a
+    column-major upper (lower) triangle is the row-major lower (upper) one
+    :return: index arrays, None for FULL_MATRIX
+    """
+    if weight_format == "FULL_MATRIX":
+        return None
+    if weight_format in ("UPPER_ROW", "LOWER_COL"):
+        return np.triu_indices(n, 1)
+    if weight_format in ("LOWER_ROW", "UPPER_COL"):
+        return np.tril_indices(n, -1)
+    if weight_format in ("UPPER_DIAG_ROW", "LOWER_DIAG_COL"):
+        return np.triu_indices(n, 0)
+    if weight_format in ("LOWER_DIAG_ROW", "UPPER_DIAG_COL"):
+        return np.tril_indices(n, 0)
+    raise ValueError("Unsupported EDGE_WEIGHT_FORMAT {}".format(weight_format))
+
+
+def weight_count(n, weight_format):
+    """
+    :return: number of tokens in the EDGE_WEIGHT_SECTION
+    """
+    if weight_format == "FULL_MATRIX":
+        return n * n
+    if weight_format.endswith("DIAG_ROW") or weight_format.endswith("DIAG_COL"):
+        return n * (n + 1) // 2
+    return n * (n - 1) // 2
+
+
+def unpack_weights(weights, n, weight_format):
+    """
+    :return: n x n matrix from the flat EDGE_WEIGHT_SECTION values
+    """
+    index = triangle_indices(n, weight_format)
+    if index is None:
+        return weights.reshape(n, n)
+    matrix = np.zeros((n, n), dtype=weights.dtype)
+    matrix[index] = weights
+    matrix[index[1], index[0]] = weights
+    return matrix
+
+
+def is_int(token: Optional[str]) -> bool:
+    return token is not None and token.lstrip("+-").isdigit()
+
+
+class TSPParser:
+    """
+    TSP / GTSP / PCGTSP file parser, reads the file once as a token stream
+    and fills NumPy arrays directly
+
+    Usage like
+    instance = TSPParser(filename=file_name)
+    instance = TSPParser(filename="MOM-instances.zip::MOM-instances/INSTANCES/5eil51.gtsp")
+    print(instance.coords)
+
+    Every instance holds its own state, so several files can be parsed at
+    the same time (e.g. from threads).
+    """
+
+    def __init__(self, filename: str = None, lines: Iterable[str] = None) -> None:
+        self.filename = filename
+        self.name = ""
+        self.dimension = 0
+        self.nClass = 0
+        self.edge_weight_type = None
+        self.edge_weight_format = None
+        # n x 2 float coordinates (NODE_COORD_SECTION)
+        self.coords = None
+        # flat explicit weights as read (EDGE_WEIGHT_SECTION)
+        self.weights = None
+        # class index of every node, -1 if the node is in no set
+        self.classes = None
+        # (from class, to class) pairs of GTSP_SET_ORDERING
+        self.precedences = np.empty((0, 2), dtype=np.int32)
+
+        if lines is not None:
+            self.parse(lines)
+        elif filename is not None and is_archive_path(filename):
+            self.parse(read_lines(filename))
+        elif filename is not None:
+            with open(filename) as f:
+                self.parse(f)
+
+    def parse(self, lines: Iterable[str]) -> None:
+        """
+        specification lines are KEY : VALUE, data sections are read as tokens
+        """
+        stream = TokenStream(lines)
+        while True:
+            line = stream.line()
+            if line is None:
+                break
+            key, _, value = line.partition(":")
+            key = key.strip().upper()
+            value = value.strip()
+            if not key:
+                continue
+            if key == "EOF":
+                break
+            elif key == "NAME":
+                self.name = value
+            elif key == "DIMENSION":
+                self.dimension = int(value)
+                logger.info("Nodes: {}".format(self.dimension))
+            elif key == "GTSP_SETS":
+                self.nClass = int(value)
+                logger.info("Classes: {}".format(self.nClass))
+            elif key == "EDGE_WEIGHT_TYPE":
+                self.edge_weight_type = value.upper()
+            elif key == "EDGE_WEIGHT_FORMAT":
+                self.edge_weight_format = value.upper()
+            elif key == "NODE_COORD_SECTION":
+                self.read_node_coords(stream)
+            elif key == "DISPLAY_DATA_SECTION":
+                for _ in stream.tokens(3 * self.dimension):
+                    pass
+            elif key == "EDGE_WEIGHT_SECTION":
+                self.read_edge_weights(stream)
+            elif key == "GTSP_SET_SECTION":
+                self.read_classes(stream)
+            elif key == "GTSP_SET_ORDERING":
+                self.read_precedences(stream)
+
+    def read_node_coords(self, stream: TokenStream) -> None:
+        """
+        dimension lines of node id, x, y (ids are 1-based)
+        """
+        self.coords = np.zeros((self.dimension, 2), dtype=np.float64)
+        for _ in range(self.dimension):
+            node, x, y = stream.tokens(3)
+            self.coords[int(node) - 1] = (float(x), float(y))
+
+    def read_edge_weights(self, stream: TokenStream) -> None:
+        """
+        flat values of any EDGE_WEIGHT_FORMAT, rows may span several lines
+        """
+        weight_format = self.edge_weight_format or "FULL_MATRIX"
+        count = weight_count(self.dimension, weight_format)
+        self.weights = np.array(list(stream.tokens(count)), dtype=np.float64)
+
+    def read_classes(self, stream: TokenStream) -> None:
+        """
+        nClass sets of set id followed by its nodes, terminated by -1
+        """
+        self.classes = np.full(self.dimension, -1, dtype=np.int32)
+        for _ in range(self.nClass):
+            class_id = int(stream.token()) - 1
+            while True:
+                node = int(stream.token())
+                if node <= 0:
+                    break
+                self.classes[node - 1] = class_id
+
+    def read_precedences(self, stream: TokenStream) -> None:
+        """
+        lines of a class followed by its successor classes, terminated by -1
+        the section ends where the first token is not a positive integer
+        """
+        pairs = []
+        while is_int(stream.peek()) and int(stream.peek()) > 0:
+            prec_from = int(stream.token()) - 1
+            while True:
+                prec_to = int(stream.token())
+                if prec_to <= 0:
+                    break
+                pairs.append((prec_from, prec_to - 1))
+        if stream.peek() == "-1":
+            stream.token()
+        self.precedences = np.array(pairs, dtype=np.int32).reshape(-1, 2)
+
+    def distance_matrix(self) -> np.ndarray:
+        """
+        edge weights of the instance, computed by the kernel of its
+        EDGE_WEIGHT_TYPE or unpacked from its EDGE_WEIGHT_FORMAT
+        :return: n x n int32 array
+        """
+        weight_type = self.edge_weight_type or ("EXPLICIT" if self.weights is not None else "EUC_2D")
+        if weight_type == "EXPLICIT":
+            matrix = unpack_weights(self.weights, self.dimension, self.edge_weight_format or "FULL_MATRIX")
+        elif weight_type in COORD_KERNELS:
+            matrix = COORD_KERNELS[weight_type](self.coords)
+        else:
+            raise ValueError("Unsupported EDGE_WEIGHT_TYPE {}".format(weight_type))
+        return np.rint(matrix).astype(np.int32)
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+### Benchmark suite of the PCGTSP solver, see ../common/benchmarking.py
+### No best-known tours are shipped with the PCGTSP instances, runs are
+### compared with the shipped log.csv by default, e.g.
+###   python benchmark.py --tier small medium --instance-dir gtsplib/PCGLNS_PCGTSP
+###   python benchmark.py --tier small --save-baseline after-reduction
+
+import os
+
+import common_path  # noqa: F401
+import benchmarking
+from run_batch import SOLVER_SCRIPT
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+INSTANCE_DIR = os.path.join(HERE, "gtsplib", "PCGLNS_PCGTSP")
+SHIPPED_LOGS = [os.path.join(HERE, "log.csv")]
+
+# Tiers by the solve time of the shipped log: below a second, up to a
+# minute, and instances that take minutes or hit the time limit
+TIERS = {
+    "small": ["ESC07", "ESC12"],
+    "medium": ["br17.10", "br17.12"],
+    "large": ["ESC25", "ESC47", "ft53.1", "ft70.1", "kro124p.1", "p43.1"],
+}
+
+
+def add_arguments(parser):
+    parser.add_argument("--instance-dir", default=INSTANCE_DIR, type=str)
+
+
+if __name__ == "__main__":
+    benchmarking.main(TIERS, lambda name, args: os.path.join(args.instance_dir, name + ".pcglns"),
+        os.path.join(HERE, SOLVER_SCRIPT), SHIPPED_LOGS, add_arguments=add_arguments)
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+
+### Optimal costs of the model against brute force on small PCGTSP instances
+### Generates random instances (forbidden arcs, random precedence orders, half
+### of them with class 0 preceding every other class as in SOP/ESC) and solves
+### them with an exact configuration and by enumeration over (visited classes,
+### last node). The optimal cost or infeasibility must agree, and every tour
+### must pass validate; the exit code is 1 otherwise, e.g.
+###   python check_precedences.py --instances 100 --reduce
+
+import argparse
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+
+import pcgtsp_didp
+import read_pcgtsp
+
+
+def random_instance(rng, nClass, max_class_size=3, forbidden=0.1, density=0.3):
+    """
+    :return: instance in the PCGLNS file format
+    """
+    classes = []
+    for k in range(nClass):
+        classes += [k] * rng.randint(1, max_class_size)
+    n = len(classes)
+    weights = [[0 if i == j else (-1 if rng.random() < forbidden else rng.randint(1, 100)) for j in range(n)]
+        for i in range(n)]
+
+    # Precedences along a random order of the classes, pairs into class 0 included
+    order = list(range(nClass))
+    rng.shuffle(order)
+    successors = {k: set() for k in range(nClass)}
+    for a in range(nClass):
+        for b in range(a + 1, nClass):
+            if rng.random() < density:
+                successors[order[a]].add(order[b])
+    if rng.random() < 0.5:
+        successors[0] = set(range(1, nClass))
+
+    lines = ["NAME : random", "TYPE : PCGTSP", "DIMENSION : {}".format(n), "GTSP_SETS : {}".format(nClass),
+        "EDGE_WEIGHT_TYPE : EXPLICIT", "EDGE_WEIGHT_FORMAT : FULL_MATRIX", "EDGE_WEIGHT_SECTION"]
+    lines += [" ".join(str(w) for w in row) for row in weights]
+    lines.append("GTSP_SET_SECTION")
+    for k in range(nClass):
+        lines.append(" ".join(str(x) for x in [k + 1] + [i + 1 for i in range(n) if classes[i] == k] + [-1]))
+    lines.append("GTSP_SET_ORDERING")
+    for k in range(nClass):
+        if successors[k]:
+            lines.append(" ".join(str(x) for x in [k + 1] + [s + 1 for s in sorted(successors[k])] + [-1]))
+    lines += ["-1", "EOF"]
+    return "\n".join(lines) + "\n"
+
+
+def brute_force(n, nClass, edges, classes, precedences):
+    """
+    enumerates the tours from every node of class 0 class by class, a class
+    is visited once all classes it must follow are (the rule of validate)
+    :return: optimal cost, None if there is no tour
+    """
+    members = [[i for i in range(n) if classes[i] == k] for k in range(nClass)]
+    before = [0] * nClass
+    for (c, d), value in precedences.items():
+        if value == -1:
+            before[c] |= 1 << d
+    best = None
+    for start in members[0]:
+        layer = {(1, start): 0}
+        for _ in range(nClass - 1):
+            following = {}
+            for (visited, last), cost in layer.items():
+                for k in range(1, nClass):
+                    if visited >> k & 1 or before[k] & ~visited:
+                        continue
+                    for i in members[k]:
+                        if edges[last, i] < 0:
+                            continue
+                        key = (visited | 1 << k, i)
+                        total = cost + int(edges[last, i])
+                        if total < following.get(key, math.inf):
+                            following[key] = total
+            layer = following
+        for (visited, last), cost in layer.items():
+            if edges[last, start] >= 0 and (best is None or cost + int(edges[last, start]) < best):
+                best = cost + int(edges[last, start])
+    return best
+
+
+def check(path, config):
+    """
+    :return: brute-force cost, Result and the list of disagreements
+    """
+    n, nClass, nodes, edges, classes, precedences = read_pcgtsp.read(path)
+    expected = brute_force(n, nClass, edges, classes, precedences)
+    result = pcgtsp_didp.solve_instance(path, config)
+    errors = []
+    if expected is None:
+        if not result.is_infeasible or result.cost is not None:
+            errors.append("infeasible, model found cost {}".format(result.cost))
+    elif result.is_infeasible:
+        errors.append("model infeasible, optimum {}".format(expected))
+    elif not result.is_optimal:
+        errors.append("not solved to optimality")
+    elif result.cost != expected:
+        errors.append("optimal cost {} != brute force {}".format(result.cost, expected))
+    if result.cost is not None and not read_pcgtsp.validate(n, nClass, edges, classes, precedences, result.tour, result.cost):
+        errors.append("invalid tour")
+    return expected, result, errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--instances", default=30, type=int)
+    parser.add_argument("--seed", default=0, type=int)
+    parser.add_argument("--min-classes", default=3, type=int)
+    parser.add_argument("--max-classes", default=7, type=int)
+    parser.add_argument("--config", default="CAASDy", type=str, help="an exact solver configuration")
+    parser.add_argument("--time-out", default=60, type=int)
+    parser.add_argument("--reduce", action="store_true")
+    parser.add_argument("--start-class", default="auto", type=str)
+    parser.add_argument("--keep", default=None, type=str, help="directory the generated instances are written to")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR, format="%(message)s")
+    config = pcgtsp_didp.Config(solvers=[args.config], time_limit=args.time_out, reduce=args.reduce,
+        start_class=args.start_class)
+    rng = random.Random(args.seed)
+    directory = args.keep or tempfile.mkdtemp(prefix="pcgtsp-check-")
+    os.makedirs(directory, exist_ok=True)
+
+    failed = 0
+    print("{:12} {:>8} {:>8} {:>10}  {}".format("Instance", "Classes", "Optimum", "Model", "Errors"))
+    for index in range(args.instances):
+        nClass = rng.randint(args.min_classes, args.max_classes)
+        path = os.path.join(directory, "r{}.pcglns".format(index))
+        with open(path, "w") as f:
+            f.write(random_instance(rng, nClass))
+        try:
+            expected, result, errors = check(path, config)
+            model = "infeasible" if result.is_infeasible else str(result.cost)
+        except ValueError as error:
+            # A start class the precedences do not allow
+            expected, model, errors = None, "-", [str(error)]
+        failed += bool(errors)
+        print("{:12} {:>8} {:>8} {:>10}  {}".format("r{}".format(index), nClass, str(expected), model, "; ".join(errors)))
+
+    print("{} of {} instances disagree with brute force".format(failed, args.instances))
+    sys.exit(1 if failed else 0)
@@ -1,18 +1,160 @@
 #!/usr/bin/env python3
 
-import argparse
 import copy
+import logging
 import time
-import csv
-import os
 
 import didppy as dp
+import numpy as np
+import common_path  # noqa: F401
+import bound_tables
+import gtsp_heuristic
+import gtsp_reduction
+import gtsp_solver
+import instance_cache
+import profiling
 import read_pcgtsp
-
-start = time.perf_counter()
-
-
-def create_model(n, nClass, nodes, edges, classes, precedences):
+from gtsp_solver import Config, Result  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+
+def precedence_arcs(edges, classes, closure):
+    """
+    arcs a feasible tour can use: not forbidden (-1), between two classes,
+    not into a class other than 0 that must come earlier, out of class 0
+    only into a class that can come second and into class 0 only from a
+    class that can come last
+    :return: n x n bool array
+    """
+    node_class = np.asarray(classes)
+    earlier = closure[node_class[np.newaxis, :], node_class[:, np.newaxis]]
+    # Arcs into class 0 close the tour, class 0 precedes the classes they come from
+    earlier[:, node_class == 0] = False
+    allowed = (np.asarray(edges) >= 0) & ~earlier
+    if len(closure) > 1:
+        allowed &= node_class[:, np.newaxis] != node_class[np.newaxis, :]
+        can_be_second = ~closure[1:].any(axis=0)
+        can_be_last = ~closure.any(axis=1)
+        start = node_class == 0
+        allowed[start] &= can_be_second[node_class]
+        allowed[:, start] &= can_be_last[node_class][:, np.newaxis]
+    return allowed
+
+
+def successor_lists(allowed):
+    """
+    compact adjacency of the usable arcs
+    :return: arc_ptr (n + 1) and arc_to int32 arrays, the successors of node
+        i are arc_to[arc_ptr[i]:arc_ptr[i + 1]]
+    """
+    rows, cols = np.nonzero(allowed)
+    arc_ptr = np.zeros(len(allowed) + 1, dtype=np.int32)
+    np.cumsum(np.bincount(rows, minlength=len(allowed)), out=arc_ptr[1:])
+    return arc_ptr, cols.astype(np.int32)
+
+
+def start_class_candidates(precedences, nClass):
+    """
+    classes the tour can start in without changing the instance: any class
+    without precedences between the other classes, otherwise class 0 and
+    every class that precedence forces right after it (it precedes all other
+    classes), class 0 is then the last one before the return
+    """
+    closure = read_pcgtsp.precedence_closure(precedences, nClass)
+    # Precedences from class 0 hold anyway
+    closure[0] = False
+    if not closure.any():
+        return list(range(nClass))
+    others = closure | np.eye(nClass, dtype=bool)
+    others[:, 0] = True
+    return [0] + [k for k in range(1, nClass) if others[k].all()]
+
+
+def select_start_class(classes, nClass, precedences):
+    """
+    the tour starts in the smallest allowed class, its nodes are the values
+    of returnToLocation (the lowest label among equally small classes)
+    """
+    sizes = np.bincount(np.asarray(classes), minlength=nClass)
+    return min(start_class_candidates(precedences, nClass), key=lambda k: (sizes[k], k))
+
+
+def relabel(classes, precedences, start_class):
+    """
+    :return: classes and precedences with the labels of class 0 and
+        start_class swapped; the old class 0 (now start_class) must follow
+        all other classes if there are precedences between them, its own
+        precedences were implied by starting there
+    """
+    swap = np.arange(max(classes) + 1)
+    swap[[0, start_class]] = swap[[start_class, 0]]
+    pairs = [(int(swap[prec_from]), int(swap[prec_to])) for (prec_from, prec_to), value in precedences.items()
+        if value == 1 and prec_from != 0 and prec_to != 0]
+    if pairs:
+        pairs += [(k, start_class) for k in range(1, len(swap)) if k != start_class]
+    relabeled = read_pcgtsp.precedence_dict(np.array(pairs, dtype=np.int32).reshape(-1, 2))
+    return [int(c) for c in swap[np.asarray(classes)]], relabeled
+
+
+def preprocess(n, nClass, edges, classes, precedences):
+    """
+    instance data the model needs beyond the distance matrix
+    :return: dict of shortest path matrix, min-distance bound tables, the
+        precedence closure and the successor lists of the usable arcs
+    """
+    closure = read_pcgtsp.precedence_closure(precedences, nClass)
+
+    # Forbidden (-1) arcs and arcs against the precedences are eliminated,
+    # they never contribute to the minima or the shortest paths either
+    allowed = precedence_arcs(edges, classes, closure)
+    arc_ptr, arc_to = successor_lists(allowed)
+    node_class = np.asarray(classes)
+    inter_class = node_class[:, np.newaxis] != node_class[np.newaxis, :]
+    total = int(inter_class.sum())
+    forbidden = int((inter_class & (np.asarray(edges) < 0)).sum())
+    logger.info("Arcs: {} usable of {} ({} forbidden, {} ruled out by precedences)".format(
+        len(arc_to), total, forbidden, total - forbidden - len(arc_to)))
+    tables = bound_tables.compute(edges, classes, nClass, allowed)
+
+    sp_start = time.perf_counter()
+    with profiling.phase("shortest paths"):
+        shortest_distance_matrix = np.minimum(bound_tables.shortest_paths(
+            np.where(allowed, edges, bound_tables.UNREACHABLE).astype(np.int32)), bound_tables.UNREACHABLE)
+    logger.info("Shortest paths: {:.3f}s".format(time.perf_counter() - sp_start))
+
+    return dict(tables, shortest_distance=shortest_distance_matrix, closure=closure, arc_ptr=arc_ptr, arc_to=arc_to)
+
+
+def read_instance(filename, cache_dir=None):
+    """
+    reads and preprocesses an instance, or memory-maps the arrays of an
+    earlier run from cache_dir
+    :return: n, nClass, nodes, edges, classes, precedences, tables
+    """
+    if cache_dir is not None:
+        key = instance_cache.instance_hash(filename)
+        cached = instance_cache.load(cache_dir, key)
+        if cached is not None:
+            logger.info("Instance loaded from cache {}".format(key))
+            edges = cached.pop("distance")
+            classes = cached.pop("classes")
+            precedences = read_pcgtsp.precedence_dict(cached.pop("precedences"))
+            n = len(edges)
+            nClass = int(cached.pop("nClass"))
+            return n, nClass, list(range(n)), edges, classes, precedences, cached
+
+    n, nClass, nodes, edges, classes, precedences = read_pcgtsp.read(filename)
+    tables = preprocess(n, nClass, edges, classes, precedences)
+
+    if cache_dir is not None:
+        instance_cache.store(cache_dir, key, dict(tables, distance=edges, classes=classes, nClass=nClass,
+            precedences=read_pcgtsp.precedence_pairs(precedences)))
+
+    return n, nClass, nodes, edges, classes, precedences, tables
+
+
+def create_model(n, nClass, nodes, edges, classes, precedences, tables=None):
 #    model = dp.Model(float_cost=True)
     model = dp.Model()
 
@@ -23,21 +165,16 @@ def create_model(n, nClass, nodes, edges, classes, precedences):
     returnToLocation = model.add_element_var(object_type=customer, target=n)
     location = model.add_element_var(object_type=customer, target=n)
 
-    distance_matrix = [
-        [edges[i, j] if (i, j) in edges else 0 for j in nodes] for i in nodes
-    ]
+    # n x n int32 array from read_pcgtsp.read
+    distance_matrix = edges
 #    distance = model.add_float_table(distance_matrix)
     distance = model.add_int_table(distance_matrix)
-    
-#    shortest_distance_matrix = copy.deepcopy(distance_matrix)
-#    for k in range(1, n):
-#        for i in range(n):
-#            for j in range(n):
-#                d = shortest_distance_matrix[i][k] + shortest_distance_matrix[k][j]
-#                if shortest_distance_matrix[i][j] > d:
-#                    shortest_distance_matrix[i][j] = d
-#    shortest_distance = model.add_int_table(shortest_distance_matrix)
-    
+
+    if tables is None:
+        tables = preprocess(n, nClass, edges, classes, precedences)
+
+    # Shortest paths over the arcs a feasible tour can use
+    shortest_distance = model.add_int_table(tables["shortest_distance"])
     
     
     con = [classes[i] for i in nodes]
@@ -49,7 +186,24 @@ def create_model(n, nClass, nodes, edges, classes, precedences):
     state_cost = dp.IntExpr.state_cost()
     name_to_customer = {}
 
-    print(precedences)
+    logger.debug(precedences)
+
+    closure = tables["closure"]
+    if closure.diagonal().any():
+        logger.info("Precedences contain a cycle, the instance is infeasible")
+
+    # Usable successors of every node, none for the dummy location n
+    arc_ptr, arc_to = tables["arc_ptr"], tables["arc_to"]
+    successor_nodes = [arc_to[arc_ptr[i]:arc_ptr[i+1]].tolist() for i in range(n)]
+    successors = model.add_set_table(successor_nodes + [[]], object_type=customer)
+
+    # Start nodes need an arc to a class that can come second and an arc
+    # back from a class that can come last
+    node_class = np.asarray(classes)
+    other = (node_class != 0) | (nClass == 1)
+    has_second = np.array([other[nodes].any() for nodes in successor_nodes], dtype=bool)
+    has_last = np.zeros(n, dtype=bool)
+    has_last[arc_to[other[np.repeat(np.arange(n), np.diff(arc_ptr))]]] = True
    
 #    # Transition: initial visit ----------------------------------
 #    # Only classes that are not successors
@@ -74,266 +228,249 @@ def create_model(n, nClass, nodes, edges, classes, precedences):
 #            )
 #            model.add_transition(init_visit)
 
-    # Transition: initial visit ----------------------------------
-    # Must start in class 0
-    for i in range(n):
-        if (classes[i]==0):
-            name = "initVisit {}".format(i)
+    with profiling.phase("transitions"):
+        # Transition: initial visit ----------------------------------
+        # Must start in class 0, at a node with an arc to a class that can come
+        # second and an arc back from a class that can come last
+        for i in range(n):
+            if (classes[i]==0) and has_second[i] and has_last[i]:
+                name = "initVisit {}".format(i)
+                name_to_customer[name] = i
+                init_visit = dp.Transition(
+                    name=name,
+                    cost=state_cost+0,
+                    effects=[
+                        (unvisitedClasses, unvisitedClasses.remove(classes[i])),
+                        (location, i),
+                        (returnToLocation, i),
+                    ],
+                    preconditions=[returnToLocation==n],
+                )
+                model.add_transition(init_visit)
+
+        pruned = int(((node_class == 0) & ~(has_second & has_last)).sum())
+        if pruned > 0:
+            logger.info("Start nodes ruled out by precedences: {}".format(pruned))
+
+        # Minimal predecessors of every class, the others are visited before them
+        minimal_predecessors = read_pcgtsp.transitive_reduction(closure)
+
+        # Transition: visit next node ----------------------------------
+        # Precondition: all predecessor classes visited
+        for i in range(0, n):
+            name = "visit {}".format(i)
             name_to_customer[name] = i
-            init_visit = dp.Transition(
+            all_preconditions = (unvisitedClasses.contains(classes[i])) & (returnToLocation<n) & successors[location].contains(i)
+            predecessors = [int(c) for c in np.flatnonzero(minimal_predecessors[:, classes[i]]) if c != 0]
+            if predecessors:
+                predecessor_set = model.create_set_const(object_type=customer, value=predecessors)
+                all_preconditions = all_preconditions & (unvisitedClasses & predecessor_set).is_empty()
+            visit = dp.Transition(
                 name=name,
-                cost=state_cost+0,
+                cost=distance[location, i] + state_cost,
                 effects=[
                     (unvisitedClasses, unvisitedClasses.remove(classes[i])),
                     (location, i),
-                    (returnToLocation, i),
                 ],
-                preconditions=[returnToLocation==n],
+                preconditions=[all_preconditions],
             )
-            model.add_transition(init_visit)
-
+            model.add_transition(visit)
 
 
-    # Transition: visit next node ----------------------------------
-    # Precondition: all predecessor classes visited
-    for i in range(0, n):
-        name = "visit {}".format(i)
-        name_to_customer[name] = i
-        all_preconditions = (unvisitedClasses.contains(classes[i])) & (returnToLocation<n) & (distance[location, i]>=0)
-        for c in range(n):
-            if ((classes[i],c) in precedences.keys() and precedences[(classes[i],c)]==-1):
-                all_preconditions = all_preconditions & (~unvisitedClasses.contains(c))
-        visit = dp.Transition(
+        # Transition: return to start node ----------------------------------
+        name = "return"
+        name_to_customer[name] = -1
+        return_to_depot = dp.Transition(
             name=name,
-            cost=distance[location, i] + state_cost,
-            effects=[
-                (unvisitedClasses, unvisitedClasses.remove(classes[i])),
-                (location, i),
-            ],
-            preconditions=[all_preconditions],
+            cost=distance[location, returnToLocation] + state_cost,
+            effects=[(location, n),
+                (returnToLocation,n)],
+            preconditions=[unvisitedClasses.is_empty(), returnToLocation<n, successors[location].contains(returnToLocation)],
         )
-        model.add_transition(visit)
-
-
-    # Transition: return to start node ----------------------------------
-    name = "return"
-    name_to_customer[name] = -1
-    return_to_depot = dp.Transition(
-        name=name,
-        cost=distance[location, returnToLocation] + state_cost,
-        effects=[(location, n),
-            (returnToLocation,n)],
-        preconditions=[unvisitedClasses.is_empty(), returnToLocation<n,distance[location, returnToLocation]>=0],
-    )
-    model.add_transition(return_to_depot)
+        model.add_transition(return_to_depot)
 
     # Dual bound: distance from retun location
-#    model.add_dual_bound((returnToLocation != n).if_then_else(shortest_distance[location,returnToLocation], 0))
+    model.add_dual_bound((returnToLocation != n).if_then_else(shortest_distance[location,returnToLocation], 0))
 
    
+    dtn, dfn, dtc, dfc = tables["dtn"], tables["dfn"], tables["dtc"], tables["dfc"]
+
     # Distance to node i from any node in another class
-    dtn = [min(distance_matrix[i][j] for i in nodes if (classes[i]!=classes[j])) for j in nodes]
-#    dtn = [min(distance_matrix[i][j] for i in nodes if ((classes[i]!=classes[j]) and (((classes[i],classes[j]) not in precedences.keys()) or (precedences[(classes[i],classes[j])]==-1)))) for j in nodes]
     min_distance_to_node = model.add_int_table(dtn)
 
     # Distance to class k from any other class
-    dtc = [min(dtn[j] for j in nodes if classes[j]==k) for k in range(nClass)]
     min_distance_to_class = model.add_int_table(dtc)
 
-    # Bound: distance to unvistited classes + distance back to start node
-    model.add_dual_bound(min_distance_to_class[unvisitedClasses] + (returnToLocation != n).if_then_else(min_distance_to_node[returnToLocation], 0))
-
-
-
     # Distance from node i to any node in another class
-    dfn = [min(distance_matrix[j][i] for i in nodes if (classes[i] != classes[j])) for j in nodes]
-#    dfn = [min(distance_matrix[j][i] for i in nodes if ((classes[i] != classes[j]) and (((classes[i],classes[j]) not in precedences.keys()) or (precedences[(classes[i],classes[j])]==-1)))) for j in nodes]
     min_distance_from_node = model.add_int_table(dfn)
-    
+
     # Distance from class k to any other class
-    dfc = [min(dfn[j] for j in nodes if classes[j]==k) for k in range(nClass)]
     min_distance_from_class = model.add_int_table(dfc)
 
-    # Bound: distance from unvistited classes + distance from current location
-    model.add_dual_bound(min_distance_from_class[unvisitedClasses] + (location != n).if_then_else(min_distance_from_node[location], 0))
-
-
-
-#    # Half distance in-out node i
-#    hdn = [round(min(distance_matrix[i][j] for i in nodes if (classes[i] != classes[j]))/2 + min(distance_matrix[j][i] for i in nodes if (classes[i] != classes[j]))/2) for j in nodes]
-#    half_distance_node = model.add_int_table(hdn)
-#
-#    # Half distance in-out class k
-#    hdc = [min(hdn[j] for j in nodes if classes[j]==k) for k in range(nClass)]
-#    half_distance_class = model.add_int_table(hdc)
-#
-#    # Bound: half distance in-out unvistited classes + half distance out current location + half distance to retornToLocation
-#    model.add_dual_bound(half_distance_class[unvisitedClasses] + 
-#        round(
-#        (location != n).if_then_else(min_distance_from_node[location]/2, 0) +
-#        (returnToLocation!=n).if_then_else(min_distance_to_node[returnToLocation]/2, 0)))
-
-#    state = model.target_state
-#    print("Bound evaluation: {}".format(model.eval_dual_bound(state)))
- 
-    return model, name_to_customer
-
-
-def solve(
-    instance_name,
-    model,
-    name_to_customer,
-    solver_name,
-    history,
-    time_limit=None,
-    seed=2023,
-    initial_beam_size=1,
-    threads=1,
-    parallel_type=0,
-):
-    if solver_name == "LNBS":
-        if parallel_type == 2:
-            parallelization_method = dp.BeamParallelizationMethod.Sbs
-        elif parallel_type == 1:
-            parallelization_method = dp.BeamParallelizationMethod.Hdbs1
-        else:
-            parallelization_method = dp.BeamParallelizationMethod.Hdbs2
-
-        solver = dp.LNBS(
-            model,
-            initial_beam_size=initial_beam_size,
-            seed=seed,
-            parallelization_method=parallelization_method,
-            threads=threads,
-            time_limit=time_limit,
-            quiet=False,
-        )
-    elif solver_name == "DD-LNS":
-        solver = dp.DDLNS(model, time_limit=time_limit, quiet=False, seed=seed)
-    elif solver_name == "FR":
-        solver = dp.ForwardRecursion(model, time_limit=time_limit, quiet=False)
-    elif solver_name == "BrFS":
-        solver = dp.BreadthFirstSearch(model, time_limit=time_limit, quiet=False)
-    elif solver_name == "CAASDy":
-        solver = dp.CAASDy(model, time_limit=time_limit, quiet=False)
-    elif solver_name == "DFBB":
-        solver = dp.DFBB(model, time_limit=time_limit, quiet=False)
-    elif solver_name == "CBFS":
-        solver = dp.CBFS(model, time_limit=time_limit, quiet=False)
-    elif solver_name == "ACPS":
-        solver = dp.ACPS(model, time_limit=time_limit, quiet=False)
-    elif solver_name == "APPS":
-        solver = dp.APPS(model, time_limit=time_limit, quiet=False)
-    elif solver_name == "DBDFS":
-        solver = dp.DBDFS(model, time_limit=time_limit, quiet=False)
-    else:
-        if parallel_type == 2:
-            parallelization_method = dp.BeamParallelizationMethod.Sbs
-        elif parallel_type == 1:
-            parallelization_method = dp.BeamParallelizationMethod.Hdbs1
-        else:
-            parallelization_method = dp.BeamParallelizationMethod.Hdbs2
-
-        solver = dp.CABS(
-            model,
-            initial_beam_size=initial_beam_size,
-            threads=threads,
-            parallelization_method=parallelization_method,
-            time_limit=time_limit,
-            quiet=False,
-        )
-
-    if solver_name == "FR":
-        solution = solver.search()
-    else:
-        with open(history, "w") as f:
-            is_terminated = False
-
-            while not is_terminated:
-                solution, is_terminated = solver.search_next()
-
-                if solution.cost is not None:
-                    f.write(
-                        "{}, {}\n".format(time.perf_counter() - start, solution.cost)
-                    )
-                    f.flush()
+    # Distance from node i to class k, and from class k to node i
+    min_distance_node_to_class = model.add_int_table(tables["dnc"])
+    min_distance_class_to_node = model.add_int_table(tables["dcn"])
 
-    print("Search time: {}s".format(solution.time))
-    print("Expanded: {}".format(solution.expanded))
-    print("Generated: {}".format(solution.generated))
+    # The next arc leaves location for an unvisited class and the last arc
+    # enters returnToLocation from one; with no class left both are the
+    # closing arc, bounded by the nearest other cluster
+    out_of_location = (location == n).if_then_else(0, unvisitedClasses.is_empty().if_then_else(
+        min_distance_from_node[location], min_distance_node_to_class.min(location, unvisitedClasses)))
+    into_return = (returnToLocation == n).if_then_else(0, unvisitedClasses.is_empty().if_then_else(
+        min_distance_to_node[returnToLocation], min_distance_class_to_node.min(unvisitedClasses, returnToLocation)))
 
-    if solution.is_infeasible:
-        print("The problem is infeasible")
+    # Bound: distance to unvistited classes + distance back to start node
+    model.add_dual_bound(min_distance_to_class[unvisitedClasses] + into_return)
 
-        return None, None
-    else:
-        tour = []
+    # Bound: distance from unvistited classes + distance from current location
+    model.add_dual_bound(min_distance_from_class[unvisitedClasses] + out_of_location)
 
-        for t in solution.transitions:
-            tour.append(name_to_customer[t.name])
+    # In + out distance of class k (cheapest arcs into and out of one of its nodes)
+    in_out_distance_class = model.add_int_table(tables["hdc"])
 
-#        print(" ".join(map(str, tour[1:-1])))
+    # Bound: half in-out distance, every remaining arc is counted twice, once
+    # at each end, so the sum is halved and rounded up (costs are integral)
+    model.add_dual_bound((in_out_distance_class[unvisitedClasses] + out_of_location + into_return + 1) // 2)
 
-        print("best bound: {}".format(solution.best_bound))
-        print("cost: {}".format(solution.cost))
+    return model, name_to_customer
 
-        if solution.is_optimal:
-            print("optimal cost: {}".format(solution.cost))
 
-#Print to csv log
-        csv_file_path = 'log.csv'
-        
-        if not os.path.exists(csv_file_path):
-            with open(csv_file_path, 'a', newline='') as csvfile:
-                csv_writer = csv.writer(csvfile)
-                csv_writer.writerow(["Instance", "Cost", "Bound", "Opt", "Time", "NodesExpanded", "NodesGenerated"])        
+class Problem:
+    """
+    an instance as read (original node ids, classes and precedences, for
+    reporting and validation) and as modeled (after the reduction and the
+    relabeling of the start class)
+    """
+
+    def __init__(self, name, n, nClass, nodes, edges, classes, precedences, tables):
+        self.name = name
+        self.n = n
+        self.nClass = nClass
+        self.nodes = nodes
+        self.edges = edges
+        self.classes = classes
+        self.precedences = precedences
+        self.model_nodes = nodes
+        self.model_edges = edges
+        self.model_classes = classes
+        self.model_precedences = precedences
+        self.tables = tables
+        self.reduction = None
+        self.start_class = 0
+
+    def to_model(self, tour):
+        """
+        :return: a tour with original node ids as a tour of the model
+        """
+        if self.reduction is not None:
+            tour = self.reduction.to_reduced(tour)
+        return read_pcgtsp.rotate(tour, self.model_classes)
+
+    def to_original(self, tour):
+        """
+        :return: a tour of the model with original node ids, started in the
+            original class 0
+        """
+        if tour is None:
+            return None
+        if self.reduction is not None:
+            tour = self.reduction.to_original(tour)
+        return read_pcgtsp.rotate(tour, self.classes)
+
+    def validate(self, tour, cost):
+        """
+        :param tour: tour with original node ids
+        """
+        return read_pcgtsp.validate(self.n, self.nClass, self.edges, self.classes, self.precedences, tour, cost)
+
+
+def prepare(filename, config):
+    """
+    parse and preprocess phases: reads the instance, reduces it and relabels
+    its start class as the config says
+    :return: Problem
+    """
+    # Precedences make a tour and its reverse different tours
+    if config.symmetric or config.initial_tour is not None:
+        raise ValueError("Symmetry breaking and initial tours are not supported for PCGTSP.")
+    with profiling.phase("read"):
+        n, nClass, nodes, edges, classes, precedences, tables = read_instance(filename, config.cache_dir)
+    problem = Problem(filename, n, nClass, nodes, edges, classes, precedences, tables)
+
+    with profiling.phase("preprocess"):
+        # The model is built on the reduced instance (removed arcs become
+        # forbidden), tours are reported with the original node ids
+        if config.reduce:
+            with profiling.phase("reduction"):
+                reduction = gtsp_reduction.reduce(edges, classes, nClass)
+            problem.reduction = reduction
+            problem.model_nodes, problem.model_edges, problem.model_classes = reduction.nodes, reduction.forbidden_edges(), reduction.classes
+
+        # The start class is relabeled to class 0, tours are reported from the original class 0
+        if config.start_class == "auto":
+            problem.start_class = select_start_class(problem.model_classes, nClass, precedences)
+        else:
+            problem.start_class = int(config.start_class)
+            if problem.start_class not in start_class_candidates(precedences, nClass):
+                raise ValueError("Precedences do not allow starting in class {}.".format(problem.start_class))
+        if problem.start_class != 0:
+            logger.info("Start class: {} ({} nodes)".format(problem.start_class,
+                np.count_nonzero(np.asarray(problem.model_classes) == problem.start_class)))
+            problem.model_classes, problem.model_precedences = relabel(problem.model_classes, precedences, problem.start_class)
+
+        if problem.reduction is not None or problem.start_class != 0:
+            problem.tables = preprocess(len(problem.model_nodes), nClass, problem.model_edges, problem.model_classes,
+                problem.model_precedences)
+    return problem
+
+
+def build_model(problem):
+    """
+    model phase
+    :return: model and name_to_customer of the Problem
+    """
+    with profiling.phase("model"):
+        model, name_to_customer = create_model(
+            len(problem.model_nodes), problem.nClass, problem.model_nodes, problem.model_edges, problem.model_classes,
+            problem.model_precedences, problem.tables
+        )
+    return model, name_to_customer
 
-    
-        with open(csv_file_path, 'a', newline='') as csvfile:
-            csv_writer = csv.writer(csvfile)
-            csv_writer.writerow([instance_name, solution.cost, solution.best_bound, solution.is_optimal, solution.time, solution.expanded, solution.generated])        
 
-        return tour, solution.cost
+def initial_tours(problem, config):
+    """
+    warm start from the heuristic of the config
+    :return: initial tour (in the model, None if there is none), its cost
+        and the primal bound
+    """
+    with profiling.phase("initial"):
+        initial_tour = None
+        initial_cost = None
+        primal_bound = config.primal_bound
+        if config.heuristic:
+            with profiling.phase("heuristic"):
+                heuristic_tour, heuristic_cost = gtsp_heuristic.solve(
+                    problem.model_edges, problem.model_classes, problem.nClass,
+                    read_pcgtsp.precedence_pairs(problem.model_precedences),
+                    time_limit=config.heuristic_time, seed=config.seeds[0],
+                )
+            heuristic_tour = problem.to_original(heuristic_tour)
+            if heuristic_cost is not None and problem.validate(heuristic_tour, heuristic_cost):
+                initial_tour, initial_cost = problem.to_model(heuristic_tour), heuristic_cost
+                if primal_bound is None or initial_cost < primal_bound:
+                    primal_bound = initial_cost
+                logger.info("initial tour cost: {}".format(initial_cost))
+    return initial_tour, initial_cost, primal_bound
+
+
+def solve_instance(filename, config=None, **options):
+    """
+    parse, preprocess, model and search one PCGTSP instance, see
+    gtsp_solver.solve_instance for the options
+    :return: Result, the tour with original node ids
+    """
+    return gtsp_solver.solve_instance(filename, prepare, build_model, initial_tours, config, **options)
 
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser()
-    parser.add_argument("input", type=str)
-    parser.add_argument("--time-out", default=1800, type=int)
-    parser.add_argument("--history", default="history.csv", type=str)
-    parser.add_argument("--config", default="CABS", type=str)
-    parser.add_argument("--seed", default=2023, type=int)
-    parser.add_argument("--non-zero-base-case", action="store_true")
-    parser.add_argument("--threads", default=1, type=int)
-    parser.add_argument("--initial-beam-size", default=1, type=int)
-    parser.add_argument("--parallel-type", default=0, type=int)
-    args = parser.parse_args()
-
-    n, nClass, nodes, edges, classes, precedences = read_pcgtsp.read(args.input)
-
-    model, name_to_customer = create_model(
-        n, nClass, nodes, edges, classes, precedences
-    )
-    tour, cost = solve(
-        args.input,
-        model,
-        name_to_customer,
-        args.config,
-        args.history,
-        time_limit=args.time_out,
-        seed=args.seed,
-        threads=args.threads,
-        initial_beam_size=args.initial_beam_size,
-        parallel_type=args.parallel_type,
-    )
-
-    
-    print("tour:")
-    print(tour)
-    print("cost:")
-    print(cost)
-    
-    if cost is not None and read_pcgtsp.validate(n, nClass, edges, classes, precedences, tour, cost):
-        print("The solution is valid.")
-    else:
-        print("The solution is invalid.")
+    gtsp_solver.main(gtsp_solver.argument_parser().parse_args(), solve_instance)
@@ -1,24 +1,82 @@
+import logging
+
+import numpy as np
+import common_path  # noqa: F401
+import profiling
 import tsp_file_parser as parser
-import math
+
+logger = logging.getLogger(__name__)
 
 def read(filename):
-    parser.TSPParser(filename)
+    with profiling.phase("parse"):
+        instance = parser.TSPParser(filename)
 
-    n = parser.TSPParser.dimension
-    nClass = parser.TSPParser.nClass
+    n = instance.dimension
+    nClass = instance.nClass
     
     nodes = list(range(n))
-    edges = {}
-    for i in range(n):
-        for j in range(n):
-            edges[i,j] = parser.TSPParser.tsp_edges[i,j]
+    # n x n int32 array, -1 marks a forbidden arc
+    with profiling.phase("matrix"):
+        edges = instance.distance_matrix()
             
-    classes = parser.TSPParser.classes
-    precedences = parser.TSPParser.precedences
+    classes = instance.classes
+    precedences = precedence_dict(instance.precedences)
 
     return n, nClass, nodes, edges, classes, precedences
 
 
+def precedence_dict(pairs):
+    """
+    :param pairs: (from class, to class) array
+    :return: dict with (from, to) -> 1 and (to, from) -> -1
+    """
+    precedences = {}
+    for prec_from, prec_to in pairs.tolist():
+        precedences[prec_from, prec_to] = 1
+        precedences[prec_to, prec_from] = -1
+    return precedences
+
+
+def precedence_pairs(precedences):
+    """
+    :return: (from class, to class) int32 array of a precedence dict
+    """
+    pairs = [key for key, value in precedences.items() if value == 1]
+    return np.array(sorted(pairs), dtype=np.int32).reshape(-1, 2)
+
+
+def precedence_closure(precedences, nClass):
+    """
+    transitive closure of the precedences, pairs into class 0 are left out
+    since the tour starts there
+    :return: nClass x nClass bool array, [a, b] is True if a precedes b
+    """
+    closure = np.zeros((nClass, nClass), dtype=bool)
+    pairs = precedence_pairs(precedences)
+    pairs = pairs[pairs[:, 1] != 0]
+    closure[pairs[:, 0], pairs[:, 1]] = True
+    for k in range(nClass):
+        closure |= closure[:, k:k+1] & closure[k]
+    return closure
+
+
+def transitive_reduction(closure):
+    """
+    :return: the pairs of a closure that no third class implies, enough to
+        check for the predecessors of a class
+    """
+    implied = (closure.astype(np.int32) @ closure.astype(np.int32)) > 0
+    return closure & ~implied
+
+
+def rotate(tour, classes):
+    """
+    :param tour: tour in the format of the solver
+    :return: the same cycle started in class 0
+    """
+    nodes = tour[:-1]
+    start = next((k for k, i in enumerate(nodes) if classes[i] == 0), 0)
+    return nodes[start:] + nodes[:start] + [-1]
 
 
 def validate(n, nClass, edges, classes, precedences, solution, cost, tolerance=1e-4):
@@ -29,23 +87,33 @@ def validate(n, nClass, edges, classes, precedences, solution, cost, tolerance=1
    
     for i in solution[1:-1]:
         if i < 0 or i > n - 1:
-            print("Customer {} does not exist".format(i))
+            logger.warning("Customer {} does not exist".format(i))
             return False
         if classes[i] in visitedClasses:
-            print("Customer {} is already visited".format(i))
+            logger.warning("Customer {} is already visited".format(i))
+            return False
+        for (c, d), value in precedences.items():
+            if c == classes[i] and value == -1 and d not in visitedClasses:
+                logger.warning("Customer {} is visited before class {}".format(i, d))
+                return False
+        if edges[previous, i] < 0:
+            logger.warning("Arc {} -> {} is forbidden".format(previous, i))
             return False
         visitedClasses.add(classes[i])
-        actual_cost += edges[previous, i]
+        actual_cost += int(edges[previous, i])
         previous = i
 
     if solution[-1] != -1:
-        print("The tour does not return to the start node")
+        logger.warning("The tour does not return to the start node")
         return False
 
-    actual_cost += edges[previous, start]
+    if edges[previous, start] < 0:
+        logger.warning("Arc {} -> {} is forbidden".format(previous, start))
+        return False
+    actual_cost += int(edges[previous, start])
 
     if len(visitedClasses) != nClass:
-        print(
+        logger.warning(
             "The number of visited classes is {}, but should be {}".format(
                 len(visitedClasses), nClass
             )
@@ -53,7 +121,7 @@ def validate(n, nClass, edges, classes, precedences, solution, cost, tolerance=1
         return False
 
     if abs(actual_cost - cost) > tolerance:
-        print(
+        logger.warning(
             "The cost of the solution {} mismatches the actual cost {}".format(
                 cost, actual_cost
             )